@@ -0,0 +1,56 @@
+import os
+import cv2
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Batched image I/O shared by the YOLOv8 and Detectron2 inference scripts
+
+def prefetch_batches(input_dir, file_names, batch_size, depth=2):
+    # Decode the next batches on a background thread while the model works on the current one
+    batches = queue.Queue(maxsize=depth)
+
+    def reader():
+        for start in range(0, len(file_names), batch_size):
+            names, images = [], []
+            for file_name in file_names[start:start + batch_size]:
+                image = cv2.imread(os.path.join(input_dir, file_name))
+                if image is None:
+                    print(f"Could not read image: {file_name}")
+                    continue
+                names.append(file_name)
+                images.append(image)
+            if names:
+                batches.put((names, images))
+        batches.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    while (batch := batches.get()) is not None:
+        yield batch
+
+class BoundedWriter:
+    # Runs output writes on a thread pool so they overlap the next forward pass, and waits on the
+    # oldest write once more than max_pending are queued so results cannot pile up in memory
+    def __init__(self, workers, max_pending):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = deque()
+        self.max_pending = max_pending
+
+    def submit(self, fn, *args):
+        self.pending.append(self.pool.submit(fn, *args))
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft().result()
+
+    def close(self):
+        try:
+            while self.pending:
+                self.pending.popleft().result()
+        finally:
+            self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,40 @@
+import os
+import re
+
+# Extensions of the files a dataset folder is listed for; anything else (.manifest.json, notes, ...) is ignored
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+DEPTH_EXTENSIONS = (".png", ".npz")
+
+def list_images(folder, extensions=IMAGE_EXTENSIONS):
+    # Sorted file names in the folder with one of the extensions
+    return sorted(f for f in os.listdir(folder) if f.lower().endswith(extensions))
+
+# Name parts that say which file of a sample this is (null_rgb_001, bolt_mask_001, scene_m000001, ...)
+ROLE_TOKENS = {"rgb", "image", "mask", "m", "depth"}
+
+def pair_key(file_name):
+    # (prefix, number): the trailing number of the stem and the name parts before it, minus the role token,
+    # so "bolt_rgb_007.png" and "bolt_mask_007.png" pair while "tshape_mask_007.png" does not.
+    # A stem without a number is its own key.
+    stem = os.path.splitext(file_name)[0]
+    match = re.match(r"(.*?)(\d+)$", stem)
+    if match is None:
+        return (stem, None)
+    tokens = [token for token in re.split(r"[_\-\s]+", match.group(1)) if token and token.lower() not in ROLE_TOKENS]
+    return ("_".join(tokens), int(match.group(2)))
+
+def keyed_files(files):
+    # pair_key -> file name; two files with the same key would make the pairing ambiguous
+    by_key = {}
+    for f in files:
+        key = pair_key(f)
+        if key in by_key:
+            raise ValueError(f"{by_key[key]} and {f} have the same pairing key {key}")
+        by_key[key] = f
+    return by_key
+
+def pair_files(files, other_files):
+    # The file of other_files with the same pair_key as each of files, or None where there is none
+    keyed_files(files)
+    by_key = keyed_files(other_files)
+    return [by_key.get(pair_key(f)) for f in files]
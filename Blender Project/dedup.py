@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+import os
+import json
+import time
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from dataset_files import list_images, pair_files
+
+def dhash(gray_image, hash_size=8):
+    # Difference hash: shrink to (hash_size + 1) x hash_size and compare horizontal neighbours
+    small = cv2.resize(gray_image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def image_hash(rgb_path, mask_path=None, hash_size=8):
+    # Decode at a quarter of the size; the hash only needs a few pixels
+    rgb = cv2.imread(rgb_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if rgb is None:
+        print(f"Could not read image: {rgb_path}")
+        return None
+    image_bits = dhash(rgb, hash_size)
+
+    # The mask hash goes in the low bits, so one Hamming distance covers both
+    if mask_path is not None:
+        mask = cv2.imread(mask_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if mask is None:
+            print(f"Could not read mask: {mask_path}")
+            return None
+        image_bits = (image_bits << (hash_size * hash_size)) | dhash(mask, hash_size)
+    return image_bits
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    # Burkhard-Keller tree over Hamming distance: a query only visits children whose edge distance
+    # is within the threshold of the query's distance to the node
+    def __init__(self):
+        self.root = None
+
+    def insert(self, value, item):
+        if self.root is None:
+            self.root = (value, item, {})
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, item, {})
+                return
+            node = child
+
+    def query(self, value, threshold):
+        # (distance, item) of every value within the threshold
+        matches = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= threshold:
+                matches.append((distance, item))
+            for edge, child in children.items():
+                if distance - threshold <= edge <= distance + threshold:
+                    stack.append(child)
+        return matches
+
+def find_duplicates(rgb_dir, mask_dir=None, threshold=4, hash_size=8, workers=None):
+    # Each image pairs with the mask of the same name and number (see dataset_files.pair_key); images without one are left out
+    rgb_files = list_images(rgb_dir)
+    if mask_dir:
+        pairs = list(zip(rgb_files, pair_files(rgb_files, list_images(mask_dir))))
+        rgb_files, mask_paths = [], []
+        for rgb_file, mask_file in pairs:
+            if mask_file is None:
+                print(f"Skipping {rgb_file}: no matching mask")
+                continue
+            rgb_files.append(rgb_file)
+            mask_paths.append(os.path.join(mask_dir, mask_file))
+    else:
+        mask_paths = [None] * len(rgb_files)
+    rgb_paths = [os.path.join(rgb_dir, f) for f in rgb_files]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        hashes = list(executor.map(partial(image_hash, hash_size=hash_size), rgb_paths, mask_paths, chunksize=32))
+    print(f"Hashed {len(rgb_files)} images in {time.perf_counter() - start:.1f}s")
+
+    # Greedy representatives: an image within the threshold of a kept image joins the nearest one's group,
+    # otherwise it is kept itself. Only kept images go in the tree, so a chain of small steps never merges
+    # images that are far apart, and every kept image is more than the threshold away from the others
+    tree = BKTree()
+    groups = {}
+    for i, value in enumerate(hashes):
+        if value is None:
+            continue
+        matches = tree.query(value, threshold)
+        if matches:
+            # Ties go to the earliest kept image
+            groups[min(matches)[1]].append(rgb_files[i])
+        else:
+            tree.insert(value, i)
+            groups[i] = [rgb_files[i]]
+    return list(groups.values())
+
+def prune_duplicates(rgb_dir, output_list, mask_dir=None, threshold=4, hash_size=8, workers=None, groups_json=None):
+    groups = find_duplicates(rgb_dir, mask_dir, threshold, hash_size, workers)
+
+    # Keep the first file of every group; the list can be used as the split instead of the whole folder
+    kept = [group[0] for group in groups]
+    with open(output_list, 'w') as f:
+        f.write("\n".join(kept) + "\n")
+
+    if groups_json is not None:
+        with open(groups_json, 'w') as f:
+            json.dump([group for group in groups if len(group) > 1], f, indent=1)
+
+    removed = sum(len(group) - 1 for group in groups)
+    print(f"Kept {len(kept)} of {len(kept) + removed} images ({removed} near-duplicates within {threshold} bits) -> {output_list}")
+    return kept
+
+if __name__ == "__main__":
+    # Example usage
+    dataset = "/home/rmoraga/CAD Project/Prismatic Geometries/synthetic_dataset/train"
+    prune_duplicates(f"{dataset}/images", f"{dataset}/pruned_train.txt", mask_dir=f"{dataset}/masks",
+                     threshold=6, groups_json=f"{dataset}/duplicate_groups.json")
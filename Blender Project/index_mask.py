@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+
+def read_index_mask(mask_path):
+    # Read without any conversion so pass_index values (8 or 16 bit) survive intact
+    mask = cv2.imread(mask_path, cv2.IMREAD_UNCHANGED)
+    if mask is not None and mask.ndim == 3:
+        # Grey masks saved as RGB(A) carry the same value in every colour channel
+        mask = mask[:, :, 0]
+    return mask
+
+def decode_index_mask(mask, index_map, index_scale=1):
+    # The compositor writes each pixel as pass_index * index_scale (0 is background)
+    counts = np.bincount(mask.ravel())
+
+    instances = []
+    for value in np.flatnonzero(counts):
+        if value == 0:
+            continue
+
+        pass_index = int(round(value / index_scale))
+        category_id = index_map.get(pass_index)
+        if category_id is None:
+            print(f"No category mapped for pass_index {pass_index}. Skipping.")
+            continue
+
+        # One binary mask per pass_index value, i.e. per object instance
+        binary_mask = np.where(mask == value, 255, 0).astype(np.uint8)
+        instances.append((pass_index, category_id, binary_mask))
+
+    return instances
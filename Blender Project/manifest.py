@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+
+# Name of the manifest file kept inside each output folder
+MANIFEST_NAME = ".manifest.json"
+
+def load_manifest(output_folder):
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        # A corrupt manifest only costs a full rebuild
+        print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+def save_manifest(output_folder, manifest):
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+
+    # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_path, manifest_path)
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _stat(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+def is_current(manifest, key, sources, outputs, params=None):
+    entry = manifest.get(key)
+    if entry is None or entry["outputs"] != outputs or entry.get("params") != params:
+        return False
+
+    # Every output must still be on disk
+    if not all(os.path.exists(path) for path in outputs):
+        return False
+
+    recorded = entry["sources"]
+    if sorted(recorded) != sorted(sources):
+        return False
+
+    for path in sources:
+        if not os.path.exists(path):
+            return False
+
+        stat = _stat(path)
+        if stat == recorded[path]["stat"]:
+            continue
+
+        # mtime/size changed (touch, copy, sync): only the content hash decides
+        if file_hash(path) != recorded[path]["hash"]:
+            return False
+        recorded[path]["stat"] = stat
+
+    return True
+
+def record(manifest, key, sources, outputs, params=None):
+    manifest[key] = {
+        "sources": {path: {"stat": _stat(path), "hash": file_hash(path)} for path in sources},
+        "outputs": outputs,
+        "params": params
+    }
+
+def manifest_outputs(manifest):
+    return {path for entry in manifest.values() for path in entry["outputs"]}
+
+def prune_manifest(manifest, live_keys, previous_outputs):
+    # Forget entries whose sources have gone
+    live_keys = set(live_keys)
+    for key in [key for key in manifest if key not in live_keys]:
+        del manifest[key]
+
+    # Delete outputs from earlier runs that no live entry produces any more
+    current_outputs = manifest_outputs(manifest)
+    for path in sorted(previous_outputs - current_outputs):
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"Removed stale output {path}")
@@ -1,6 +1,16 @@
 import cv2
 import numpy as np
 import os
+import csv
+import time
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from index_mask import read_index_mask
+
+# Columns of the mask statistics index, one row per mask region
+# (pass_index -1 is the whole foreground of a binary mask, or an empty mask with area 0)
+INDEX_COLUMNS = ["file", "pass_index", "category_id", "area", "visible_percent",
+                 "bbox_x", "bbox_y", "bbox_w", "bbox_h", "centroid_x", "centroid_y"]
 
 def process_masks(input_folder, output_folder, object_name):
     # Ensure output folder exists
@@ -33,9 +43,89 @@ def process_masks(input_folder, output_folder, object_name):
         cv2.imwrite(new_image_path, binary_image)
         print(f"Processed: {filename} -> {new_filename}")
 
-# Example usage
-input_folder = "/home/rmoraga/CAD Project/Prismatic Geometries/synthetic_dataset/train/masks"  # Change this to your input folder path
-output_folder = "/home/rmoraga/CAD Project/test"  # Change this to your output folder path
-object_name = "bolt"  # Change this to your object name
+def mask_stats(mask_path, index_map=None, index_scale=1):
+    # Binary masks use the same 127 threshold as process_masks; index masks keep their pass_index values
+    if index_map is None:
+        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+    else:
+        mask = read_index_mask(mask_path)
+    if mask is None:
+        print(f"Could not read mask: {mask_path}")
+        return []
+
+    file_name = os.path.basename(mask_path)
+    labels = (mask > 127).astype(np.uint8) if index_map is None else mask
+
+    # Gather the foreground pixels once, grouped by value, and reduce every group in one pass
+    ys, xs = np.nonzero(labels)
+    if xs.size == 0:
+        return [(file_name, -1, -1, 0, 0.0, 0, 0, 0, 0, -1.0, -1.0)]
+    values = labels[ys, xs]
+    order = np.argsort(values, kind="stable")
+    values, xs, ys = values[order], xs[order], ys[order]
+    unique_values, starts, areas = np.unique(values, return_index=True, return_counts=True)
+
+    x_min, x_max = np.minimum.reduceat(xs, starts), np.maximum.reduceat(xs, starts)
+    y_min, y_max = np.minimum.reduceat(ys, starts), np.maximum.reduceat(ys, starts)
+    centroid_x = np.add.reduceat(xs.astype(np.float64), starts) / areas
+    centroid_y = np.add.reduceat(ys.astype(np.float64), starts) / areas
+
+    rows = []
+    for i, value in enumerate(unique_values.tolist()):
+        if index_map is None:
+            pass_index, category_id = -1, -1
+        else:
+            pass_index = int(round(value / index_scale))
+            category_id = index_map.get(pass_index, -1)
+        rows.append((file_name, pass_index, category_id, int(areas[i]),
+                     round(float(areas[i]) / mask.size * 100, 4),
+                     int(x_min[i]), int(y_min[i]), int(x_max[i] - x_min[i] + 1), int(y_max[i] - y_min[i] + 1),
+                     round(float(centroid_x[i]), 2), round(float(centroid_y[i]), 2)))
+    return rows
+
+def write_mask_index(rows, output_path):
+    # The output extension picks the format: .npz (one array per column), .parquet (needs pyarrow) or .csv
+    extension = os.path.splitext(output_path)[1].lower()
+    columns = list(zip(*rows)) if rows else [[] for _ in INDEX_COLUMNS]
+
+    if extension == ".npz":
+        np.savez_compressed(output_path, **{name: np.array(column) for name, column in zip(INDEX_COLUMNS, columns)})
+    elif extension == ".parquet":
+        import pyarrow
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(pyarrow.table({name: list(column) for name, column in zip(INDEX_COLUMNS, columns)}), output_path)
+    else:
+        with open(output_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(INDEX_COLUMNS)
+            writer.writerows(rows)
+
+def build_mask_index(input_folder, output_path, index_map=None, index_scale=1, workers=None):
+    # One statistics pass over every mask, written as a single index instead of re-encoded images
+    mask_paths = [os.path.join(input_folder, f) for f in sorted(os.listdir(input_folder)) if f.endswith(('.png', '.jpg', '.jpeg'))]
+
+    start = time.perf_counter()
+    rows = []
+    # map() keeps the index in file order whatever order the workers finish in
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        stats = partial(mask_stats, index_map=index_map, index_scale=index_scale)
+        for done, mask_rows in enumerate(executor.map(stats, mask_paths, chunksize=16), start=1):
+            rows.extend(mask_rows)
+            if done % 1000 == 0:
+                print(f"[{done}/{len(mask_paths)}] masks indexed ({done / (time.perf_counter() - start):.1f} files/s)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    write_mask_index(rows, output_path)
+    print(f"Indexed {len(mask_paths)} masks ({len(rows)} regions) into {output_path} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    # Example usage
+    input_folder = "/home/rmoraga/CAD Project/Prismatic Geometries/synthetic_dataset/train/masks"  # Change this to your input folder path
+    output_folder = "/home/rmoraga/CAD Project/test"  # Change this to your output folder path
+    object_name = "bolt"  # Change this to your object name
+
+    # Statistics index of the whole dataset (index_map={pass_index: category_id} for index masks)
+    build_mask_index(input_folder, os.path.join(output_folder, "mask_index.csv"))
 
-process_masks(input_folder, output_folder, object_name)
+    # Copies of the masks with the percentage in their file names
+    #process_masks(input_folder, output_folder, object_name)
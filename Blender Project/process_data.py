@@ -3,11 +3,20 @@ import Imath
 import numpy as np
 import cv2
 import os
+import json
 import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from manifest import load_manifest, save_manifest, is_current, record, manifest_outputs, prune_manifest
 
-def save_masks(input_folder, output_folder, prefix="rgb"):
+def save_masks(input_folder, output_folder, prefix="rgb", incremental=True):
     # Create output directory if it doesn’t exist
     os.makedirs(output_folder, exist_ok=True)
+
+    # Load the record of what earlier runs already copied
+    manifest = load_manifest(output_folder) if incremental else {}
+    previous_outputs = manifest_outputs(manifest)
+    live_files = []
     
     # Initialize the counter
     index = 1
@@ -19,74 +28,206 @@ def save_masks(input_folder, output_folder, prefix="rgb"):
             new_filename = f"null_{prefix}_{index:03d}.png"
             input_path = os.path.join(input_folder, filename)
             output_path = os.path.join(output_folder, new_filename)
+            live_files.append(filename)
             
+            # Increment the index for the next file
+            index += 1
+
+            # Skip files whose copy is already up to date
+            if incremental and is_current(manifest, filename, [input_path], [output_path]):
+                continue
+
             # Copy the file to the output folder with the new name
             shutil.copy(input_path, output_path)
+            if incremental:
+                record(manifest, filename, [input_path], [output_path])
             print(f"Renamed {filename} to {new_filename}")
-            
-            # Increment the index for the next file
-            index += 1
 
-def extract_rgbd(input_folder, output_rgb_folder, output_depth_folder):
+    if incremental:
+        prune_manifest(manifest, live_files, previous_outputs)
+        save_manifest(output_folder, manifest)
+
+# Channels decoded from each multilayer EXR render
+RGB_CHANNELS = ["RGB.R", "RGB.G", "RGB.B"]
+DEPTH_CHANNEL = "Depth.V"
+
+# Largest finite float16; empty background (effectively infinite depth) is clipped to it
+FLOAT16_MAX = float(np.finfo(np.float16).max)
+
+# File name of the memory-mapped depth stack (its scale goes in a .json next to it)
+DEPTH_STACK = "depth.npy"
+
+def depth_visualization(depth_data):
+    # Normalize depth data (scale to 0-255) for visualization
+    depth_data = np.clip((depth_data - np.min(depth_data)) / (np.max(depth_data) - np.min(depth_data)) * 255, 0, 255).astype(np.uint8)
+
+    # Invert the depth image
+    return 255 - depth_data
+
+def load_depth(depth_path, index=None, visualize=False):
+    # Metric depth from an .npz frame or frame `index` of the memory-mapped stack (float16 on disk)
+    if depth_path.endswith(".npz"):
+        with np.load(depth_path) as data:
+            depth_data, scale = data["depth"], float(data["scale"])
+    elif depth_path.endswith(".npy"):
+        depth_data = np.load(depth_path, mmap_mode="r")[index]
+        with open(os.path.splitext(depth_path)[0] + ".json") as f:
+            scale = json.load(f)["scale"]
+    else:
+        # Old 8-bit PNGs are already the visualization
+        return cv2.imread(depth_path, cv2.IMREAD_GRAYSCALE)
+
+    depth_data = depth_data.astype(np.float32) / scale
+    # The same inverted 8-bit image the PNG output used to hold
+    return depth_visualization(depth_data) if visualize else depth_data
+
+def exr_size(exr_path):
+    exr_file = OpenEXR.InputFile(exr_path)
+    dw = exr_file.header()['dataWindow']
+    exr_file.close()
+    return dw.max.x - dw.min.x + 1, dw.max.y - dw.min.y + 1
+
+def open_depth_stack(stack_path, count, width, height, depth_scale):
+    # Reuse the stack when it still fits the folder; otherwise start a new one (every frame is then converted)
+    shape = (count, height, width)
+    created = True
+    if os.path.exists(stack_path):
+        stack = np.load(stack_path, mmap_mode="r+")
+        created = stack.shape != shape or stack.dtype != np.float16
+    if created:
+        stack = np.lib.format.open_memmap(stack_path, mode="w+", dtype=np.float16, shape=shape)
+
+    with open(os.path.splitext(stack_path)[0] + ".json", 'w') as f:
+        json.dump({"scale": depth_scale}, f)
+    return stack, created
+
+def convert_exr(exr_path, rgb_output_path, depth_output_path, depth_format="png", depth_scale=1.0):
+    # Open the EXR file
+    exr_file = OpenEXR.InputFile(exr_path)
+    header = exr_file.header()
+
+    # Define the data window to read the entire image
+    dw = header['dataWindow']
+    width, height = dw.max.x - dw.min.x + 1, dw.max.y - dw.min.y + 1
+
+    # Decode the RGB and depth channels in a single pass over the file
+    pixel_type = Imath.PixelType(Imath.PixelType.FLOAT)
+    r, g, b, depth = exr_file.channels(RGB_CHANNELS + [DEPTH_CHANNEL], pixel_type)
+    exr_file.close()
+
+    # Stack straight into BGR order so no cv2.cvtColor pass is needed
+    bgr_data = np.stack([np.frombuffer(c, dtype=np.float32) for c in (b, g, r)], axis=-1).reshape((height, width, 3))
+
+    # Normalize RGB to 0-255 and save as PNG
+    bgr_data = np.clip(bgr_data * 255.0, 0, 255).astype(np.uint8)
+    cv2.imwrite(rgb_output_path, bgr_data)
+
+    depth_data = np.frombuffer(depth, dtype=np.float32).reshape((height, width))
+
+    if depth_format == "png":
+        # Save the inverted depth image
+        cv2.imwrite(depth_output_path, depth_visualization(depth_data))
+        return None
+
+    # Metric depth times one dataset-wide scale, so values stay comparable across frames
+    depth_half = np.minimum(depth_data * depth_scale, FLOAT16_MAX).astype(np.float16)
+    if depth_format == "npz":
+        np.savez_compressed(depth_output_path, depth=depth_half, scale=np.float32(depth_scale))
+        return None
+
+    # Memory-mapped stack: the parent process writes the frame into place
+    return depth_half
+
+def extract_rgbd(input_folder, output_rgb_folder, output_depth_folder, workers=1, incremental=True, depth_format="png", depth_scale=1.0, naming="index"):
+    # depth_format: "png" (8-bit per-image visualization), "npz" (float16 per frame)
+    # or "memmap" (one float16 depth.npy stack, frame i = null_depth index i + 1)
+    # naming: "index" (null_rgb_001.png, ...) or "frame" (the EXR's own name, e.g. scene_000015.png,
+    # which matches the YOLO labels and COCO file names SYNGEN.py writes during the render)
     # Create output directories if they don’t exist
     os.makedirs(output_rgb_folder, exist_ok=True)
     os.makedirs(output_depth_folder, exist_ok=True)
-    
-    # Initialize the counter
-    index = 1
-    
-    # Loop over all EXR files in the input folder
-    for filename in sorted(os.listdir(input_folder)):
-        if filename.endswith(".exr"):
-            exr_path = os.path.join(input_folder, filename)
-            
-            # Open the EXR file
-            exr_file = OpenEXR.InputFile(exr_path)
-            header = exr_file.header()
-            
-            # Define the data window to read the entire image
-            dw = header['dataWindow']
-            width, height = dw.max.x - dw.min.x + 1, dw.max.y - dw.min.y + 1
-
-            # Extract RGB channels with updated channel names
-            rgb_channels = ["RGB.R", "RGB.G", "RGB.B"]
-            rgb_data = [np.frombuffer(exr_file.channel(c, Imath.PixelType(Imath.PixelType.FLOAT)), dtype=np.float32) for c in rgb_channels]
-            rgb_data = np.stack(rgb_data, axis=-1).reshape((height, width, 3))
-            
-            # Normalize RGB to 0-255 and save as PNG
-            rgb_data = np.clip(rgb_data * 255.0, 0, 255).astype(np.uint8)
-            rgb_output_path = os.path.join(output_rgb_folder, f"null_rgb_{index:03d}.png")
-            cv2.imwrite(rgb_output_path, cv2.cvtColor(rgb_data, cv2.COLOR_RGB2BGR))
-            
-            # Extract Depth channel with the correct channel name
-            depth_data = np.frombuffer(exr_file.channel("Depth.V", Imath.PixelType(Imath.PixelType.FLOAT)), dtype=np.float32)
-            depth_data = depth_data.reshape((height, width))
 
-            # Optional: Normalize depth data (scale to 0-255) for visualization or storage
-            depth_data = np.clip((depth_data - np.min(depth_data)) / (np.max(depth_data) - np.min(depth_data)) * 255, 0, 255).astype(np.uint8)
+    # Number the EXR files up front so the output names do not depend on completion order
+    exr_files = [f for f in sorted(os.listdir(input_folder)) if f.endswith(".exr")]
+    exr_paths = [os.path.join(input_folder, f) for f in exr_files]
+    if naming == "frame":
+        rgb_names = [os.path.splitext(f)[0] for f in exr_files]
+        depth_names = rgb_names
+    else:
+        rgb_names = [f"null_rgb_{index:03d}" for index in range(1, len(exr_files) + 1)]
+        depth_names = [f"null_depth_{index:03d}" for index in range(1, len(exr_files) + 1)]
+    rgb_paths = [os.path.join(output_rgb_folder, f"{name}.png") for name in rgb_names]
+    if depth_format == "memmap":
+        depth_paths = [os.path.join(output_depth_folder, DEPTH_STACK)] * len(exr_files)
+    else:
+        depth_paths = [os.path.join(output_depth_folder, f"{name}.{depth_format}") for name in depth_names]
+    params = None if depth_format == "png" else [depth_format, depth_scale]
 
-            # Invert the depth image
-            depth_data = 255 - depth_data
+    # Only convert EXR files that are new or changed since the last run
+    manifest = load_manifest(output_rgb_folder) if incremental else {}
+    previous_outputs = manifest_outputs(manifest)
+    jobs = [i for i in range(len(exr_files))
+            if not (incremental and is_current(manifest, exr_files[i], [exr_paths[i]], [rgb_paths[i], depth_paths[i]], params))]
 
-            # Save the inverted depth image
-            depth_output_path = os.path.join(output_depth_folder, f"null_depth_{index:03d}.png")
-            cv2.imwrite(depth_output_path, depth_data)
-            
-            print(f"Processed {filename}: Saved RGB to {rgb_output_path} and Depth to {depth_output_path}")
-            
-            # Increment the index for the next file
-            index += 1
+    stack = None
+    if depth_format == "memmap" and exr_files:
+        stack, created = open_depth_stack(depth_paths[0], len(exr_files), *exr_size(exr_paths[0]), depth_scale)
+        if created:
+            jobs = list(range(len(exr_files)))
+
+    print(f"{len(exr_files) - len(jobs)} EXR files up to date, converting {len(jobs)}")
+    job_args = ([exr_paths[i] for i in jobs], [rgb_paths[i] for i in jobs], [depth_paths[i] for i in jobs],
+                [depth_format] * len(jobs), [depth_scale] * len(jobs))
+
+    start = time.perf_counter()
+    if workers > 1:
+        # Fan the conversions out over a process pool; map() still yields results in input order
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(convert_exr, *job_args, chunksize=4)
+    else:
+        executor = None
+        results = map(convert_exr, *job_args)
+
+    try:
+        for done, (i, depth_half) in enumerate(zip(jobs, results), start=1):
+            if stack is not None:
+                stack[i] = depth_half
+
+            # Hashing the source here overlaps with the workers converting the next files
+            if incremental:
+                record(manifest, exr_files[i], [exr_paths[i]], [rgb_paths[i], depth_paths[i]], params)
+
+            rate = done / max(time.perf_counter() - start, 1e-9)
+            print(f"[{done}/{len(jobs)}] Processed {exr_files[i]}: Saved RGB to {rgb_paths[i]} and Depth to {depth_paths[i]} ({rate:.1f} files/s)")
+
+        if incremental:
+            prune_manifest(manifest, exr_files, previous_outputs)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if stack is not None:
+            stack.flush()
+        # Keep whatever finished even if the run was interrupted
+        if incremental:
+            save_manifest(output_rgb_folder, manifest)
+
+    elapsed = time.perf_counter() - start
+    print(f"Extracted {len(jobs)} EXR files in {elapsed:.1f}s ({len(jobs) / max(elapsed, 1e-9):.1f} files/s) using {workers} worker(s)")
 
 # Example usage
-home = "/home/rmoraga/CAD Project/Prismatic Geometries"
+if __name__ == "__main__":
+    home = "/home/rmoraga/CAD Project/Prismatic Geometries"
 
-input_exr = f"{home}/raw/train/images"
-input_masks = f"{home}/real_dataset"
-output_rgb = f"{home}/dataset_v2/train/rgb"
-output_depth = f"{home}/dataset_v2/train/depth"
-output_masks = f"{home}/real_dataset/images"
+    input_exr = f"{home}/raw/train/images"
+    input_masks = f"{home}/real_dataset"
+    output_rgb = f"{home}/dataset_v2/train/rgb"
+    output_depth = f"{home}/dataset_v2/train/depth"
+    output_masks = f"{home}/real_dataset/images"
 
-os.makedirs("output", exist_ok=True)
-#extract_rgbd(input_exr, output_rgb, output_depth)
-save_masks(input_masks, output_masks)
+    os.makedirs("output", exist_ok=True)
+    #extract_rgbd(input_exr, output_rgb, output_depth, workers=os.cpu_count())
+    #extract_rgbd(input_exr, output_rgb, output_depth, workers=os.cpu_count(), depth_format="memmap")
+    # Renders annotated by SYNGEN.py: keep the frame names so the labels still pair with the images
+    #extract_rgbd(input_exr, output_rgb, output_depth, workers=os.cpu_count(), naming="frame")
+    save_masks(input_masks, output_masks)
 
@@ -1,34 +1,115 @@
 import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageOps
 import pillow_heif  # Import the HEIC support library
+from manifest import load_manifest, save_manifest, is_current, record, manifest_outputs, prune_manifest
 
-def resize(input_folder, output_folder, target_size=(640, 640)):
+# Let Image.open read HEIC (also in the worker processes, which import this module)
+pillow_heif.register_heif_opener()
+
+def next_number(output_folder, prefix="test"):
+    # Continue after the highest "<prefix>_NNN.png" already in the output folder
+    pattern = re.compile(rf"{re.escape(prefix)}_(\d+)\.png$")
+    numbers = [int(match.group(1)) for match in map(pattern.match, os.listdir(output_folder)) if match]
+    return max(numbers, default=0) + 1
+
+def ingest_photo(input_path, output_path, target_size):
+    try:
+        # Open the image (HEIC is supported via pillow-heif)
+        with Image.open(input_path) as img:
+            # Smallest size that still covers the target once fitted
+            scale = max(target_size[0] / img.width, target_size[1] / img.height)
+            needed = (int(img.width * scale + 0.5), int(img.height * scale + 0.5))
+
+            # Decode at reduced size where the format allows: JPEG DCT scaling, or an embedded HEIC thumbnail
+            if img.format == "JPEG":
+                img.draft("RGB", needed)
+            elif img.format == "HEIF" and getattr(pillow_heif, "thumbnail", None) is not None:
+                img = pillow_heif.thumbnail(img, min_box=max(needed))
+
+            # Convert the image to RGB if necessary (e.g., HEIC)
+            img = img.convert("RGB")
+
+            # Resize the image while preserving aspect ratio
+            img = ImageOps.fit(img, target_size, method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+
+            # Save the resized image as PNG
+            img.save(output_path, format="PNG")
+        return None
+    except Exception as e:
+        return str(e)
+
+def resize(input_folder, output_folder, target_size=(640, 640), incremental=True, workers=None, prefix="test"):
     # Ensure the output folder exists
     os.makedirs(output_folder, exist_ok=True)
 
-    count = 67
+    # Load the record of what earlier runs already converted
+    manifest = load_manifest(output_folder) if incremental else {}
+    previous_outputs = manifest_outputs(manifest)
+    live_files = []
+    params = list(target_size)
+
+    # Photos converted before keep their names; new ones are numbered after the existing outputs
+    jobs = []
     for filename in sorted(os.listdir(input_folder)):
         input_path = os.path.join(input_folder, filename)
-        output_name = f"test_{count:03d}.png"  # Rename pattern
-        output_path = os.path.join(output_folder, output_name)
-
-        try:
-            # Open the image (HEIC is supported via pillow-heif)
-            with Image.open(input_path) as img:
-                # Convert the image to RGB if necessary (e.g., HEIC)
-                img = img.convert("RGB")
-                
-                # Resize the image while preserving aspect ratio
-                img = ImageOps.fit(img, target_size, method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
-                
-                # Save the resized image as PNG
-                img.save(output_path, format="PNG")
-                print(f"Resized, converted, and saved: {output_path}")
+        entry = manifest.get(filename)
+        output_path = entry["outputs"][0] if entry else None
+
+        # Skip photos whose converted copy is already up to date
+        if incremental and output_path and is_current(manifest, filename, [input_path], [output_path], params):
+            live_files.append(filename)
+            continue
+        jobs.append((filename, input_path, output_path))
+
+    count = next_number(output_folder, prefix)
+    print(f"{len(live_files)} photos up to date, converting {len(jobs)} (new ones from {prefix}_{count:03d})")
+
+    # Workers write hidden temporary files; they are renamed in input order, so numbering never depends on timing
+    temp_paths = [os.path.join(output_folder, f".ingest_{i:06d}.tmp.png") for i in range(len(jobs))]
+    job_args = ([input_path for _, input_path, _ in jobs], temp_paths, [target_size] * len(jobs))
+
+    start = time.perf_counter()
+    if workers is None or workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(ingest_photo, *job_args, chunksize=4)
+    else:
+        executor = None
+        results = map(ingest_photo, *job_args)
+
+    try:
+        for (filename, input_path, output_path), temp_path, error in zip(jobs, temp_paths, results):
+            if error is not None:
+                print(f"Skipping file {filename}: {error}")
+                manifest.pop(filename, None)
+                continue
+
+            if output_path is None:
+                output_path = os.path.join(output_folder, f"{prefix}_{count:03d}.png")  # Rename pattern
                 count += 1
-        except Exception as e:
-            print(f"Skipping file {filename}: {e}")
+            os.replace(temp_path, output_path)
+            print(f"Resized, converted, and saved: {output_path}")
+            if incremental:
+                record(manifest, filename, [input_path], [output_path], params)
+            live_files.append(filename)
+
+        print(f"Converted {len(jobs)} photos in {time.perf_counter() - start:.1f}s")
+        if incremental:
+            prune_manifest(manifest, live_files, previous_outputs)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        # Keep the names handed out so far even if the run was interrupted
+        if incremental:
+            save_manifest(output_folder, manifest)
 
-# Example usage
-input_folder = "/home/rmoraga/CAD Project/Prismatic Geometries/test_dataset/raw"
-output_folder = "/home/rmoraga/CAD Project/Prismatic Geometries/test_dataset"
-resize(input_folder, output_folder)
+if __name__ == "__main__":
+    # Example usage
+    input_folder = "/home/rmoraga/CAD Project/Prismatic Geometries/test_dataset/raw"
+    output_folder = "/home/rmoraga/CAD Project/Prismatic Geometries/test_dataset"
+    resize(input_folder, output_folder)
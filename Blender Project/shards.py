@@ -0,0 +1,191 @@
+import io
+import os
+import json
+import mmap
+from dataset_files import list_images, pair_files, DEPTH_EXTENSIONS
+
+# Packed dataset shards: each sample's files (rgb, depth, mask, label, ...) are appended to large
+# "<name>-NNNNN.pack" files, and "<name>.idx" holds one JSON line per sample with the
+# [pack, offset, length] of every field. Samples are only ever appended; a later line for the
+# same key replaces the earlier one, and bytes written after the last index line are ignored.
+
+# Pack files roll over at this size so no single file grows without bound
+MAX_PACK_BYTES = 1 << 30
+
+def pack_path(root, name, pack):
+    return os.path.join(root, f"{name}-{pack:05d}.pack")
+
+def index_path(root, name):
+    return os.path.join(root, f"{name}.idx")
+
+def read_index(root, name):
+    # Key -> {field: [pack, offset, length]}, in first-written order
+    index = {}
+    path = index_path(root, name)
+    if not os.path.exists(path):
+        return index
+
+    with open(path) as f:
+        for line in f:
+            # A run killed mid-write can leave a truncated last line
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            index[entry["key"]] = entry["fields"]
+    return index
+
+def trim_partial_line(path):
+    # Cut a partial last line (left by a run killed mid-write) off the file, scanning back from the end
+    with open(path, 'rb+') as f:
+        position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(position - step + newline + 1)
+                return
+            position -= step
+        f.truncate(0)
+
+class ShardWriter:
+    # Appends samples to the shard set "<root>/<name>", continuing after whatever is already there
+    def __init__(self, root, name, max_pack_bytes=MAX_PACK_BYTES):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.name = name
+        self.max_pack_bytes = max_pack_bytes
+
+        # Resume in the last pack file that exists
+        self.pack = 0
+        while os.path.exists(pack_path(root, name, self.pack + 1)):
+            self.pack += 1
+        self.data = open(pack_path(root, name, self.pack), 'ab')
+
+        # New index lines must start on a line of their own, or readers would stop at the broken one
+        if os.path.exists(index_path(root, name)):
+            trim_partial_line(index_path(root, name))
+        self.index = open(index_path(root, name), 'a')
+
+    def add(self, key, **fields):
+        # Every field value is the raw bytes of one file (an encoded PNG, a label .txt, ...)
+        if self.data.tell() >= self.max_pack_bytes:
+            self.data.close()
+            self.pack += 1
+            self.data = open(pack_path(self.root, self.name, self.pack), 'ab')
+
+        locations = {}
+        for field, blob in fields.items():
+            locations[field] = [self.pack, self.data.tell(), len(blob)]
+            self.data.write(blob)
+
+        # The data is on disk before the index line that points at it
+        self.data.flush()
+        self.index.write(json.dumps({"key": key, "fields": locations}, separators=(",", ":")) + "\n")
+        self.index.flush()
+
+    def add_files(self, key, **paths):
+        fields = {}
+        for field, path in paths.items():
+            with open(path, 'rb') as f:
+                fields[field] = f.read()
+        self.add(key, **fields)
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ShardReader:
+    # Random access to the samples of "<root>/<name>" through read-only memory maps
+    def __init__(self, root, name):
+        self.root = root
+        self.name = name
+        self.index = read_index(root, name)
+        self.maps = {}
+
+    # Memory maps are per process; after pickling (DataLoader workers) they are reopened on first use
+    def __getstate__(self):
+        return {**self.__dict__, "maps": {}}
+
+    def keys(self):
+        return list(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def fields(self, key):
+        return list(self.index[key])
+
+    def _map(self, pack, end):
+        mapped = self.maps.get(pack)
+        # Remap when a writer has appended past the end of the current map
+        if mapped is None or len(mapped) < end:
+            with open(pack_path(self.root, self.name, pack), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[pack] = mapped
+        return mapped
+
+    def get(self, key, field):
+        # Zero-copy view into the pack file
+        pack, offset, length = self.index[key][field]
+        return memoryview(self._map(pack, offset + length))[offset:offset + length]
+
+    def read(self, key, field):
+        return bytes(self.get(key, field))
+
+    def open(self, key, field):
+        return io.BytesIO(self.get(key, field))
+
+    def close(self):
+        for mapped in self.maps.values():
+            mapped.close()
+        self.maps = {}
+
+def pack_dataset(root, name, rgb_dir, mask_dir=None, depth_dir=None, label_dir=None):
+    # Masks and depth maps pair with the rgb file of the same name and number (see dataset_files.pair_key), labels with its stem
+    rgb_files = list_images(rgb_dir)
+    mask_files = pair_files(rgb_files, list_images(mask_dir)) if mask_dir else [None] * len(rgb_files)
+    depth_files = pair_files(rgb_files, list_images(depth_dir, DEPTH_EXTENSIONS)) if depth_dir else [None] * len(rgb_files)
+
+    # Keys already packed are skipped, so an interrupted run can simply be started again
+    packed = read_index(root, name)
+    added = 0
+    with ShardWriter(root, name) as writer:
+        for rgb_file, mask_file, depth_file in zip(rgb_files, mask_files, depth_files):
+            if rgb_file in packed:
+                continue
+            if (mask_dir and mask_file is None) or (depth_dir and depth_file is None):
+                print(f"Skipping {rgb_file}: no matching mask or depth file")
+                continue
+
+            paths = {"rgb": os.path.join(rgb_dir, rgb_file)}
+            if mask_file is not None:
+                paths["mask"] = os.path.join(mask_dir, mask_file)
+            if depth_file is not None:
+                paths["depth"] = os.path.join(depth_dir, depth_file)
+            if label_dir is not None:
+                label_path = os.path.join(label_dir, os.path.splitext(rgb_file)[0] + ".txt")
+                if os.path.exists(label_path):
+                    paths["label"] = label_path
+
+            writer.add_files(rgb_file, **paths)
+            added += 1
+
+    print(f"Packed {added} samples into {index_path(root, name)} ({len(packed)} already there)")
+
+if __name__ == "__main__":
+    # Example usage
+    dataset = "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset"
+    for split in ("train", "val"):
+        pack_dataset(f"{dataset}/shards", split, f"{dataset}/{split}/images",
+                     mask_dir=f"{dataset}/{split}/masks", label_dir=f"{dataset}/{split}/labels")
@@ -1,13 +1,179 @@
 import os
 import json
+import shutil
+import struct
+import tempfile
 import cv2
 import numpy as np
 from PIL import Image
 from datetime import date
+from concurrent.futures import ProcessPoolExecutor
 
-def format(images_dir, masks_dir, output_json):
-    # Initialize COCO JSON structure
-    coco_data = {
+import blender_project  # puts the shared helpers on sys.path
+from index_mask import read_index_mask, decode_index_mask
+
+def encode_rle(binary_mask):
+    # COCO compressed RLE; pycocotools ships with Detectron2 so it is only needed for this option
+    from pycocotools import mask as mask_utils
+    rle = mask_utils.encode(np.asfortranarray(binary_mask > 0, dtype=np.uint8))
+    rle["counts"] = rle["counts"].decode("ascii")
+    return rle
+
+def mask_annotations(mask_path, category_id, index_map=None, segmentation_format="polygon", index_scale=1):
+    annotations = []
+
+    if index_map is None:
+        # Binary mask: every contour becomes an object of the filename class
+        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        _, binary_mask = cv2.threshold(mask, 1, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        for contour in contours:
+            # Calculate bounding box and segmentation
+            x, y, w, h = cv2.boundingRect(contour)
+
+            # Mask pixels inside this contour only (holes stay empty), cropped to its box
+            instance_mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.drawContours(instance_mask, [contour], -1, 255, cv2.FILLED, offset=(-x, -y))
+            instance_mask &= binary_mask[y:y + h, x:x + w]
+
+            if segmentation_format == "rle":
+                full_mask = np.zeros_like(binary_mask)
+                full_mask[y:y + h, x:x + w] = instance_mask
+                segmentation = encode_rle(full_mask)
+            else:
+                segmentation = [contour.flatten().tolist()]
+
+            annotations.append({
+                "category_id": category_id,
+                "bbox": [x, y, w, h],
+                "area": int(np.count_nonzero(instance_mask)),
+                "segmentation": segmentation,
+                "iscrowd": 0
+            })
+        return annotations
+
+    # Index mask: every pass_index value is one object with its own category
+    for _, instance_category, binary_mask in decode_index_mask(read_index_mask(mask_path), index_map, index_scale):
+        if segmentation_format == "rle":
+            segmentation = encode_rle(binary_mask)
+        else:
+            # An occluded object can be split into several polygons of the same instance
+            contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            segmentation = [contour.flatten().tolist() for contour in contours if len(contour) >= 3]
+            if not segmentation:
+                continue
+
+        x, y, w, h = cv2.boundingRect(binary_mask)
+        annotations.append({
+            "category_id": instance_category,
+            "bbox": [x, y, w, h],
+            "area": int(np.count_nonzero(binary_mask)),
+            "segmentation": segmentation,
+            "iscrowd": 0
+        })
+    return annotations
+
+# First bytes of every PNG file
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Compact separators keep large annotation files small and fast to write
+COMPACT = (",", ":")
+
+class CocoWriter:
+    # Streams a COCO file: images go straight to the output, annotations are
+    # spooled to a temporary file and appended when the writer is closed
+    def __init__(self, output_json, header):
+        self.file = open(output_json, 'w')
+        self.spool = tempfile.TemporaryFile('w+')
+        self.image_count = 0
+        self.annotation_count = 0
+
+        # Header keys first, then open the images array
+        self.file.write(json.dumps(header, separators=COMPACT)[:-1] + ',"images":[')
+
+    def add_image(self, image):
+        self.file.write(("," if self.image_count else "") + json.dumps(image, separators=COMPACT))
+        self.image_count += 1
+
+    def add_annotation(self, annotation):
+        self.spool.write(("," if self.annotation_count else "") + json.dumps(annotation, separators=COMPACT))
+        self.annotation_count += 1
+
+    def close(self):
+        self.file.write('],"annotations":[')
+        self.spool.seek(0)
+        shutil.copyfileobj(self.spool, self.file)
+        self.file.write("]}")
+        self.spool.close()
+        self.file.close()
+
+class JsonlWriter:
+    # Writes one JSON object per line ({"header"}, {"image"}, {"annotation"}) for merge_jsonl
+    def __init__(self, output_jsonl, header):
+        self.file = open(output_jsonl, 'w')
+        self.file.write(json.dumps({"header": header}, separators=COMPACT) + "\n")
+
+    def add_image(self, image):
+        self.file.write(json.dumps({"image": image}, separators=COMPACT) + "\n")
+
+    def add_annotation(self, annotation):
+        self.file.write(json.dumps({"annotation": annotation}, separators=COMPACT) + "\n")
+
+    def close(self):
+        self.file.close()
+
+def shard_paths(output_json, shards, jsonl=False):
+    stem = os.path.splitext(output_json)[0]
+    extension = ".jsonl" if jsonl else ".json"
+    if shards == 1:
+        return [stem + extension if jsonl else output_json]
+    return [f"{stem}_{k:02d}-of-{shards:02d}{extension}" for k in range(shards)]
+
+def merge_jsonl(jsonl_paths, output_json):
+    # Merge JSON-lines shards into one COCO file, renumbering ids so shards from separate runs cannot collide.
+    # An image that appears again later (a re-rendered frame, in a later file or further down the same file)
+    # replaces the earlier one with the same file_name, annotations included.
+    latest = {}
+    for k, path in enumerate(jsonl_paths):
+        with open(path) as f:
+            for line_number, line in enumerate(f):
+                entry = json.loads(line)
+                if "image" in entry:
+                    latest[entry["image"]["file_name"]] = (k, line_number)
+
+    writer = None
+    image_id = 0
+    annotation_id = 0
+    for k, path in enumerate(jsonl_paths):
+        # Annotations follow their image, so a repeated source id refers to its latest image line
+        image_ids = {}
+        with open(path) as f:
+            for line_number, line in enumerate(f):
+                entry = json.loads(line)
+                if "header" in entry:
+                    if writer is None:
+                        writer = CocoWriter(output_json, entry["header"])
+                elif "image" in entry:
+                    image = entry["image"]
+                    if latest[image["file_name"]] != (k, line_number):
+                        image_ids[image["id"]] = None
+                        continue
+                    image_ids[image["id"]] = image_id
+                    writer.add_image({**image, "id": image_id})
+                    image_id += 1
+                else:
+                    annotation = entry["annotation"]
+                    if image_ids[annotation["image_id"]] is None:
+                        continue
+                    writer.add_annotation({**annotation, "id": annotation_id, "image_id": image_ids[annotation["image_id"]]})
+                    annotation_id += 1
+    if writer is not None:
+        writer.close()
+
+def format(images_dir, masks_dir, output_json, index_map=None, shards=1, jsonl=False, workers=1, segmentation_format="polygon", index_scale=1):
+    # Initialize COCO JSON header (images and annotations are streamed)
+    header = {
         "info": {
             "description": "Generated COCO Dataset",
             "year": 2025,
@@ -16,8 +182,6 @@ def format(images_dir, masks_dir, output_json):
             "date_created": str(date.today())
         },
         "licenses": [],
-        "images": [],
-        "annotations": [],
         "categories": [
             {"id": 0, "name": "bolt", "supercategory": "none"},
             {"id": 1, "name": "tshape", "supercategory": "none"},
@@ -27,19 +191,44 @@ def format(images_dir, masks_dir, output_json):
     }
     
     class_to_id = {"bolt": 0, "tshape": 1, "yoke": 2, "null": 3}
-    annotation_id = 0
-    image_id = 0
 
-    # Loop through image files
-    for image_file in os.listdir(images_dir):
+    # Each image and its annotations go to shard image_id % shards
+    writer_class = JsonlWriter if jsonl else CocoWriter
+    writers = [writer_class(path, header) for path in shard_paths(output_json, shards, jsonl)]
+
+    try:
+        write_images(images_dir, masks_dir, writers, class_to_id, index_map, workers, segmentation_format, index_scale)
+    finally:
+        for writer in writers:
+            writer.close()
+
+def image_size(image_path):
+    # Read width/height from the PNG IHDR chunk without decoding any pixels
+    with open(image_path, 'rb') as f:
+        header = f.read(24)
+    if header[:8] == PNG_SIGNATURE and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+
+    # Other formats: PIL only parses the header until pixels are requested
+    with Image.open(image_path) as image:
+        return image.size
+
+def annotate_image(image_path, mask_path, category_id, index_map=None, segmentation_format="polygon", index_scale=1):
+    width, height = image_size(image_path)
+    return width, height, mask_annotations(mask_path, category_id, index_map, segmentation_format, index_scale)
+
+def write_images(images_dir, masks_dir, writers, class_to_id, index_map=None, workers=1, segmentation_format="polygon", index_scale=1):
+    # Collect the image/mask pairs first, in sorted order so ids are reproducible
+    image_files, image_paths, mask_paths, category_ids = [], [], [], []
+    for image_file in sorted(os.listdir(images_dir)):
         if image_file.endswith(".png"):
             # Extract components from filename
             parts = image_file.split('_')
             class_name = parts[0]
             file_id = parts[-1].split('.')[0]
 
-            # Validate class name
-            if class_name not in class_to_id:
+            # Validate class name (index masks carry their own classes)
+            if index_map is None and class_name not in class_to_id:
                 continue
             
             image_path = os.path.join(images_dir, image_file)
@@ -47,53 +236,52 @@ def format(images_dir, masks_dir, output_json):
             
             # Check if corresponding mask exists
             if os.path.exists(mask_path):
-                # Open image and get dimensions
-                image = Image.open(image_path)
-                width, height = image.size
-                
-                # Add image entry to COCO
-                coco_data["images"].append({
-                    "id": image_id,
-                    "file_name": image_file,
-                    "width": width,
-                    "height": height
-                })
-                
-                # Open mask and find contours
-                mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
-                _, binary_mask = cv2.threshold(mask, 1, 255, cv2.THRESH_BINARY)
-                contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                
-                for contour in contours:
-                    # Calculate bounding box and segmentation
-                    x, y, w, h = cv2.boundingRect(contour)
-                    segmentation = [contour.flatten().tolist()]
-                    area = cv2.contourArea(contour)
-                    
-                    # Add annotation
-                    coco_data["annotations"].append({
-                        "id": annotation_id,
-                        "image_id": image_id,
-                        "category_id": class_to_id[class_name],
-                        "bbox": [x, y, w, h],
-                        "area": area,
-                        "segmentation": segmentation,
-                        "iscrowd": 0
-                    })
-                    annotation_id += 1
-            
-                image_id += 1
+                image_files.append(image_file)
+                image_paths.append(image_path)
+                mask_paths.append(mask_path)
+                category_ids.append(class_to_id.get(class_name))
+
+    # Fan the per-image work out over a process pool; map() keeps input order
+    jobs = (image_paths, mask_paths, category_ids, [index_map] * len(image_files), [segmentation_format] * len(image_files), [index_scale] * len(image_files))
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(annotate_image, *jobs, chunksize=16)
+    else:
+        executor = None
+        results = map(annotate_image, *jobs)
+
+    # Assign image and annotation ids in merge order so every run numbers identically
+    annotation_id = 0
+    try:
+        for image_id, (image_file, (width, height, annotations)) in enumerate(zip(image_files, results)):
+            # Add image entry to COCO
+            writer = writers[image_id % len(writers)]
+            writer.add_image({
+                "id": image_id,
+                "file_name": image_file,
+                "width": width,
+                "height": height
+            })
+
+            for annotation in annotations:
+                writer.add_annotation({"id": annotation_id, "image_id": image_id, **annotation})
+                annotation_id += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-    # Save to output JSON file
-    with open(output_json, 'w') as f:
-        json.dump(coco_data, f, indent=4)
+if __name__ == "__main__":
+    # Specify the input directories and output file
+    images_dir = "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/train/images"  # Replace with the path to your RGB images directory
+    masks_dir = "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/train/masks"    # Replace with the path to your masks directory
+    output_json = "quantity_train.json"
 
-# Specify the input directories and output file
-images_dir = "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/train/images"  # Replace with the path to your RGB images directory
-masks_dir = "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/train/masks"    # Replace with the path to your masks directory
-output_json = "quantity_train.json"
+    # For mixed-scene renders with pass_index masks, map each pass_index to a category id instead
+    index_map = None  # e.g. {1: 1, 9: 0}, for masks rendered with SYNGEN's "output": {"mask_pass": "index"}
+    # (the .blend file's own ID Mask output is binary); pass index_scale=... for masks scaled some other way
 
-# Create COCO annotations
-format(images_dir, masks_dir, output_json)
+    # Create COCO annotations (segmentation_format="rle" stores compressed RLE instead of polygons;
+    # use shards=N for N COCO files, or jsonl=True plus merge_jsonl for a mergeable intermediate)
+    format(images_dir, masks_dir, output_json, index_map, workers=os.cpu_count())
 
-print(f"COCO annotations saved to {output_json}")
+    print(f"COCO annotations saved to {output_json}")
@@ -1,46 +1,91 @@
 import cv2
 import os
+import json
+import argparse
+import torch
 from detectron2.engine import DefaultPredictor
 from detectron2.config import get_cfg
 from detectron2.utils.visualizer import Visualizer
 from detectron2 import model_zoo
 from detectron2.data import MetadataCatalog
+from format_dataset import encode_rle
+import blender_project  # puts the shared helpers on sys.path
+from batch_io import prefetch_batches, BoundedWriter
+
+class BatchPredictor(DefaultPredictor):
+    # Same preprocessing as DefaultPredictor, but a whole list of images goes through one forward call
+    def __call__(self, original_images):
+        with torch.no_grad():
+            inputs = []
+            for original_image in original_images:
+                if self.input_format == "RGB":
+                    original_image = original_image[:, :, ::-1]
+                height, width = original_image.shape[:2]
+                image = self.aug.get_transform(original_image).apply_image(original_image)
+                image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+                inputs.append({"image": image, "height": height, "width": width})
+            return self.model(inputs)
+
+def save_visualization(image, instances, metadata, output_path):
+    # Visualize the results
+    v = Visualizer(image[:, :, ::-1], metadata, scale=1.2)
+    out = v.draw_instance_predictions(instances)
+    cv2.imwrite(output_path, out.get_image()[:, :, ::-1])
+
+def save_instances(instances, output_path):
+    # Compact per-image results for downstream scoring: boxes, scores, classes and RLE masks
+    result = {
+        "boxes": instances.pred_boxes.tensor.numpy().tolist(),
+        "scores": instances.scores.numpy().tolist(),
+        "classes": instances.pred_classes.numpy().tolist()
+    }
+    if instances.has("pred_masks"):
+        result["masks"] = [encode_rle(mask) for mask in instances.pred_masks.numpy()]
+    with open(output_path, 'w') as f:
+        json.dump(result, f, separators=(",", ":"))
+
+parser = argparse.ArgumentParser(description="Run the trained Detectron2 model over a folder of images")
+parser.add_argument("--input-dir", default="/home/rmoraga/CAD Project/Prismatic Geometries/test_dataset", help="Folder containing input images")
+parser.add_argument("--output-dir", default="output/quantity/test", help="Folder to save output images or results")
+parser.add_argument("--weights", default="output/quantity/model_final.pth", help="Path to your trained model")
+parser.add_argument("--score-thresh", type=float, default=0.5, help="Confidence threshold")
+parser.add_argument("--batch-size", type=int, default=4, help="Images per forward call")
+parser.add_argument("--writers", type=int, default=4, help="Threads writing outputs")
+parser.add_argument("--no-visualize", action="store_true", help="Write per-image JSON results instead of rendered overlays")
+args = parser.parse_args()
 
 # Load the trained model
 cfg = get_cfg()
 cfg.merge_from_file(model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"))
-cfg.MODEL.WEIGHTS = "output/quantity/model_final.pth"  # Path to your trained model
-cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5  # Confidence threshold
+cfg.MODEL.WEIGHTS = args.weights  # Path to your trained model
+cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = args.score_thresh  # Confidence threshold
 cfg.MODEL.ROI_HEADS.NUM_CLASSES = 3  # Adjust to the number of classes in your dataset
-predictor = DefaultPredictor(cfg)
+predictor = BatchPredictor(cfg)
 
 # Metadata (optional, for visualization purposes)
 metadata = MetadataCatalog.get("my_dataset")  # Assuming "my_dataset" is registered with classes
 MetadataCatalog.get("my_dataset").set(thing_classes=["bolt", "tshape", "yoke"])
 
 # Define paths
-input_dir = "/home/rmoraga/CAD Project/Prismatic Geometries/test_dataset"  # Folder containing input images
-output_dir = "output/quantity/test"  # Folder to save output images
+input_dir = args.input_dir
+output_dir = args.output_dir
 os.makedirs(output_dir, exist_ok=True)  # Ensure the output directory exists
 
-# Perform inference on each image in the input folder
-for file_name in os.listdir(input_dir):
-    if file_name.lower().endswith(('.png', '.jpg', '.jpeg')):  # Ensure only image files are processed
-        input_path = os.path.join(input_dir, file_name)
-        output_path = os.path.join(output_dir, f"output_{file_name}")
-
-        # Read the image
-        image = cv2.imread(input_path)
-
-        # Perform inference
-        outputs = predictor(image)
+# Ensure only image files are processed
+file_names = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
 
-        # Visualize the results (optional)
-        v = Visualizer(image[:, :, ::-1], metadata, scale=1.2)
-        out = v.draw_instance_predictions(outputs["instances"].to("cpu"))
-        result_image = out.get_image()[:, :, ::-1]
+# Perform inference batch by batch; writing happens on a thread pool so it overlaps the next forward pass
+with BoundedWriter(args.writers, args.writers * args.batch_size * 2) as writer:
+    for names, images in prefetch_batches(input_dir, file_names, args.batch_size):
+        outputs = predictor(images)
 
-        # Save the output image
-        cv2.imwrite(output_path, result_image)
+        for file_name, image, output in zip(names, images, outputs):
+            instances = output["instances"].to("cpu")
+            if args.no_visualize:
+                output_path = os.path.join(output_dir, f"{os.path.splitext(file_name)[0]}.json")
+                writer.submit(save_instances, instances, output_path)
+            else:
+                output_path = os.path.join(output_dir, f"output_{file_name}")
+                writer.submit(save_visualization, image, instances, metadata, output_path)
 
-        print(f"Processed {file_name} -> {output_path}")
+            print(f"Processed {file_name} -> {output_path}")
@@ -5,13 +5,76 @@ from detectron2.evaluation import COCOEvaluator
 from detectron2.engine import DefaultTrainer
 from detectron2.config import get_cfg
 from detectron2 import model_zoo
+from detectron2.utils.file_io import PathManager
+from iopath.common.file_io import PathHandler
+import io
 import os
 import json
+import pickle
+import hashlib
+from collections import defaultdict
 
+import blender_project  # puts the shared helpers on sys.path
+from shards import ShardReader
+
+
+class ShardPathHandler(PathHandler):
+    # Serves "shard://<root>/<name>/<field>/<key>" paths from packed shards, so dataset dicts can
+    # point into a shard and Detectron2's PathManager.open reads the bytes through a memory map
+    PREFIX = "shard://"
+
+    def __init__(self):
+        super().__init__()
+        self.readers = {}
+
+    def _get_supported_prefixes(self):
+        return [self.PREFIX]
+
+    def _reader(self, path):
+        shard, field, key = path[len(self.PREFIX):].rsplit("/", 2)
+        root, name = os.path.split(shard)
+        # One reader per shard set and process; the index is parsed on first use
+        reader = self.readers.get(shard)
+        if reader is None:
+            reader = self.readers[shard] = ShardReader(root, name)
+        return reader, field, key
+
+    def _open(self, path, mode="r", buffering=-1, **kwargs):
+        reader, field, key = self._reader(path)
+        data = reader.open(key, field)
+        return data if "b" in mode else io.TextIOWrapper(data)
+
+    def _exists(self, path, **kwargs):
+        reader, field, key = self._reader(path)
+        return key in reader and field in reader.fields(key)
+
+    def _isfile(self, path, **kwargs):
+        return self._exists(path)
+
+PathManager.register_handler(ShardPathHandler())
+
+
+def load_custom_dataset(json_path, image_dir, cache_dir=None):
+    with open(json_path, 'rb') as f:
+        raw = f.read()
+
+    # Reuse the dataset dicts from an earlier launch if this exact JSON was already parsed
+    cache_path = None
+    if cache_dir is not None:
+        digest = hashlib.sha1(raw)
+        digest.update(os.path.abspath(image_dir).encode())
+        cache_path = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(json_path))[0]}_{digest.hexdigest()[:16]}.pkl")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+
+    coco_dict = json.loads(raw)
+
+    # Group annotations by image in one pass instead of scanning all of them per image
+    annotations_by_image = defaultdict(list)
+    for ann in coco_dict["annotations"]:
+        annotations_by_image[ann["image_id"]].append(ann)
 
-def load_custom_dataset(json_path, image_dir):
-    with open(json_path) as f:
-        coco_dict = json.load(f)
     dataset_dicts = []
     for img in coco_dict["images"]:
         record = {}
@@ -20,9 +83,8 @@ def load_custom_dataset(json_path, image_dir):
         record["height"] = img["height"]
         record["width"] = img["width"]
         
-        annotations = [ann for ann in coco_dict["annotations"] if ann["image_id"] == img["id"]]
         objs = []
-        for ann in annotations:
+        for ann in annotations_by_image.get(img["id"], []):
             obj = {
                 "bbox": ann["bbox"],
                 "bbox_mode": BoxMode.XYWH_ABS,
@@ -32,14 +94,21 @@ def load_custom_dataset(json_path, image_dir):
             objs.append(obj)
         record["annotations"] = objs
         dataset_dicts.append(record)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(dataset_dicts, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
     return dataset_dicts
 
-# Register the training dataset
-DatasetCatalog.register("my_dataset", lambda: load_custom_dataset("quantity_train.json", "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/train/images"))
+# Register the training dataset (packed shards work too: image_dir="shard://<shards root>/train/rgb")
+DatasetCatalog.register("my_dataset", lambda: load_custom_dataset("quantity_train.json", "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/train/images", cache_dir="dataset_cache"))
 MetadataCatalog.get("my_dataset").set(thing_classes=["bolt", "tshape", "yoke"])
 
 # Register validation dataset
-DatasetCatalog.register("my_validation_dataset", lambda: load_custom_dataset("quantity_val.json", "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/val/images"))
+DatasetCatalog.register("my_validation_dataset", lambda: load_custom_dataset("quantity_val.json", "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/val/images", cache_dir="dataset_cache"))
 MetadataCatalog.get("my_validation_dataset").set(thing_classes=["bolt", "tshape", "yoke"])
 
 adv_model = model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_X_101_32x8d_FPN_3x.yaml")
@@ -50,6 +119,7 @@ cfg.merge_from_file(reg_model)
 cfg.DATASETS.TRAIN = ("my_dataset",)  # Training dataset
 cfg.DATASETS.TEST = ("my_validation_dataset",)  # Validation dataset
 cfg.DATALOADER.NUM_WORKERS = 2
+#cfg.INPUT.MASK_FORMAT = "bitmask"  # Required when the JSON was generated with segmentation_format="rle"
 cfg.MODEL.WEIGHTS = model_zoo.get_checkpoint_url("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml")
 cfg.SOLVER.IMS_PER_BATCH = 8
 cfg.SOLVER.BASE_LR = 0.0001
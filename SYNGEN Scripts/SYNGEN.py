@@ -0,0 +1,925 @@
+import bpy
+import os
+import sys
+import json
+import random
+import argparse
+import hashlib
+import gc
+import csv
+import time
+import numpy as np
+from mathutils import Matrix, Vector
+
+# Blender does not put the script's own folder on sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from composer import compose_scene, bounding_radius
+from annotate import index_annotations, yolo_lines
+from frames import frame_number, output_name, frame_name
+
+# Usage (headless):
+#   blender -b "Blender Project/Syn Data Generator.blend" -P "SYNGEN Scripts/SYNGEN.py" -- --scene "SYNGEN Scripts/scenes/tshape.json"
+#   (outputs go to "output" under the working directory unless the spec or --output-root says otherwise)
+# Any key of the scene spec can be left out; the defaults below are used instead.
+
+DEFAULT_SPEC = {
+    "name": "scene",
+    "output_root": "output",
+    "model_dir": "../../Blender Project/CAD Model Dataset",
+    "material": "resin",
+    "iterations": 1,
+    "stop_frame": 25,
+    "table": {
+        "length": 1.12,
+        "width": 0.816,
+        "height": 0.6,
+        "center": [0, 0],
+        "rigid_body": False,
+        "friction": 1.0
+    },
+    "physics": {
+        "mass": 1.0,
+        "friction": 0.8,
+        "restitution": 0.3,
+        "collision_shape": "CONVEX_HULL",
+        "collision_margin": 0.001
+    },
+    "camera": {
+        "x_angles": [40, 30, 0, -30, -60, -90],
+        "z_angles": [0, 45, 90, 135, 180, 225, 270, 315]
+    },
+    "models": [],
+    "scatter": None,
+    "profile": None,
+    # Output names: '#' runs become the zero-padded frame number, {name} the scene name.
+    # "mask_pass": "id_mask" keeps the .blend file's binary ID Mask output; "index" writes the IndexOB pass
+    # instead, as a 16-bit grey PNG whose pixels are each object's pass_index (0 background), for the
+    # index_map decoding of format_dataset.py and process_labels.py (with index_scale 1)
+    "output": {
+        "main": "{name}_######",
+        "mask": "{name}_m######",
+        "mask_pass": "id_mask"
+    },
+    # Annotations read from the IndexOB pass during the run ("formats": "yolo" and/or "coco");
+    # "categories" lists the COCO category names by id, and a model's "category" picks one of them
+    # ("classes" maps a model's declared pass_index to a category id for models without one).
+    # Labels are named after the frame ({frame}.txt, COCO file_name {frame}{image_extension}); convert the
+    # EXRs with process_data.extract_rgbd(..., naming="frame") so the images keep the same names
+    "annotations": {
+        "formats": [],
+        "classes": {},
+        "categories": [],
+        "min_area": 0,
+        "image_extension": ".png"
+    },
+    # Purge the generator's orphaned datablocks every N frames and/or past an RSS high-water mark (MB); 0/None turns either off
+    "memory": {
+        "purge_every": 48,
+        "rss_limit_mb": None,
+        "report_every": 48
+    }
+}
+
+# Defaults for the optional "scatter" section: K random models per iteration at non-overlapping drop positions
+DEFAULT_SCATTER = {
+    "count": 1,
+    "models": [],
+    "height": 0.3,
+    "clearance": 0.01,
+    "max_attempts": 100
+}
+
+# Named render-quality profiles; a scene without "profile" keeps the .blend file's own settings
+RENDER_PROFILES = {
+    "preview": {
+        "samples": 16,
+        "denoiser": "OPENIMAGEDENOISE",
+        "resolution_percentage": 50,
+        "tile_size": 256,
+        "light_paths": {"max_bounces": 4, "diffuse_bounces": 1, "glossy_bounces": 1, "transmission_bounces": 2, "transparent_max_bounces": 4}
+    },
+    "train": {
+        "samples": 64,
+        "denoiser": "OPENIMAGEDENOISE",
+        "resolution_percentage": 100,
+        "tile_size": 256,
+        "light_paths": {"max_bounces": 8, "diffuse_bounces": 2, "glossy_bounces": 2, "transmission_bounces": 6, "transparent_max_bounces": 8}
+    },
+    "hifi": {
+        "samples": 512,
+        "denoiser": "OPENIMAGEDENOISE",
+        "resolution_percentage": 100,
+        "tile_size": 2048,
+        "light_paths": {"max_bounces": 12, "diffuse_bounces": 4, "glossy_bounces": 4, "transmission_bounces": 12, "transparent_max_bounces": 8}
+    }
+}
+
+# Prefix of the normalized STL meshes kept in bpy.data between scenes
+LIBRARY_PREFIX = "SYNGEN_"
+
+# Defaults for one entry of "models" (pass_index 0 is background in IndexOB, so it is never a default)
+DEFAULT_MODEL = {
+    "size": 0.15,
+    "pass_index": 1,
+    "category": None,
+    "count": 1,
+    "drop": {"x": 0, "y": 0, "height": 0.6, "spacing": 0.3}
+}
+
+# Function to read the scene spec (JSON, or YAML when PyYAML is available) and fill in defaults
+def load_spec(spec_path):
+    with open(spec_path) as f:
+        if spec_path.lower().endswith((".yaml", ".yml")):
+            import yaml
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+
+    merged = {}
+    for key, default in DEFAULT_SPEC.items():
+        value = spec.get(key, default)
+        merged[key] = {**default, **value} if isinstance(default, dict) else value
+
+    if merged["scatter"] is not None:
+        merged["scatter"] = {**DEFAULT_SCATTER, **merged["scatter"]}
+
+    # JSON object keys are strings; pass_index values are not
+    merged["annotations"]["classes"] = {int(pass_index): category_id for pass_index, category_id in merged["annotations"]["classes"].items()}
+
+    # Model paths are relative to the spec file
+    merged["model_dir"] = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(spec_path)), merged["model_dir"]))
+    return merged
+
+# Function to parse the arguments Blender passes through after "--"
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="SYNGEN synthetic data generator")
+    parser.add_argument("--scene", required=True, help="Path to the JSON/YAML scene spec")
+    parser.add_argument("--output-root", help="Override the spec's output_root")
+    parser.add_argument("--iterations", type=int, help="Override the spec's iteration count")
+    parser.add_argument("--shard", type=int, default=0, help="Index of the frame shard this process renders")
+    parser.add_argument("--shards", type=int, default=1, help="Total number of frame shards in the run")
+    parser.add_argument("--seed", type=int, help="Run seed; every drop's seed is derived from it and the iteration")
+    parser.add_argument("--rerender", nargs="+", help="Frame manifest(s) to re-render from instead of simulating")
+    parser.add_argument("--frames", nargs="+", help="With --rerender: only these frame names")
+    parser.add_argument("--profile", choices=sorted(RENDER_PROFILES), help="Override the spec's render profile")
+    return parser.parse_args(argv)
+
+# Function to delete only the imported STL models
+def delete_existing_stl_models():
+    for obj in bpy.context.scene.objects:
+        if obj.type == 'MESH' and obj.name.startswith("Imported_"):
+            bpy.data.objects.remove(obj, do_unlink=True)
+    # Clean orphan data
+    for block in bpy.data.meshes:
+        if block.users == 0:
+            bpy.data.meshes.remove(block)
+
+# Function to reset the object's position, rotation, and animation
+def reset_object_and_animation(imported_object, drop_location, rng):
+    imported_object.location = drop_location
+    imported_object.rotation_euler = (
+        rng.uniform(0, 2 * 3.14159),  # Random rotation around the X-axis
+        rng.uniform(0, 2 * 3.14159),  # Random rotation around the Y-axis
+        rng.uniform(0, 2 * 3.14159)   # Random rotation around the Z-axis
+    )
+    bpy.context.scene.frame_set(0)
+
+# Function to pick a drop coordinate: a number, or a list to choose from
+def pick(value, rng):
+    return rng.choice(value) if isinstance(value, list) else value
+
+# Function to look up the category id of a model entry, or None when it is not annotated
+def model_category(spec, model):
+    if model["category"] is not None:
+        return model["category"]
+    return spec["annotations"]["classes"].get(model["pass_index"])
+
+# Function to expand the "models" section into concrete (file, size, pass_index, category, drop_location) placements
+def resolve_models(spec, rng):
+    placements = []
+    for entry in spec["models"]:
+        entry = {**DEFAULT_MODEL, **entry, "drop": {**DEFAULT_MODEL["drop"], **entry.get("drop", {})}}
+
+        # A "choice" entry picks one of several models (with their own size) once per run
+        if "choice" in entry:
+            entry = {**entry, **rng.choice(entry["choice"])}
+
+        # An object on pass_index 0 would render as background and leave its masks empty
+        if entry["pass_index"] < 1:
+            raise ValueError(f"Model {entry['file']} has pass_index {entry['pass_index']}; it must be 1 or more.")
+
+        drop = entry["drop"]
+        x, y = pick(drop["x"], rng), pick(drop["y"], rng)
+        for copy in range(entry["count"]):
+            drop_location = (x, y, spec["table"]["height"] + drop["height"] + copy * drop["spacing"])
+            placements.append((entry["file"], entry["size"], entry["pass_index"] + copy, model_category(spec, entry), drop_location))
+    return placements
+
+# Function to get the shared, normalized mesh of an STL model, importing and parsing it only once
+def library_mesh(spec, file_name):
+    mesh_name = f"{LIBRARY_PREFIX}{file_name}"
+    mesh = bpy.data.meshes.get(mesh_name)
+
+    if mesh is None:
+        file_path = os.path.join(spec["model_dir"], file_name)
+        bpy.ops.import_mesh.stl(filepath=file_path)
+        imported_object = bpy.context.selected_objects[0]
+        mesh = imported_object.data
+
+        # Keep the mesh alive between scenes even when no object uses it
+        mesh.name = mesh_name
+        mesh.use_fake_user = True
+        bpy.data.objects.remove(imported_object, do_unlink=True)
+
+        # Normalize once: origin at the bounding-box centre and largest dimension 1, baked into the vertices
+        coords = [0.0] * (len(mesh.vertices) * 3)
+        mesh.vertices.foreach_get("co", coords)
+        lows = [min(coords[axis::3]) for axis in range(3)]
+        highs = [max(coords[axis::3]) for axis in range(3)]
+        center = Vector([(low + high) / 2 for low, high in zip(lows, highs)])
+        largest_dim = max(high - low for low, high in zip(lows, highs))
+        mesh.transform(Matrix.Scale(1 / largest_dim, 4) @ Matrix.Translation(-center))
+        print(f"Imported {file_name} into the mesh library.")
+
+    material_name = spec["material"]
+    if material_name in bpy.data.materials:
+        material = bpy.data.materials[material_name]
+        if list(mesh.materials) != [material]:
+            mesh.materials.clear()
+            mesh.materials.append(material)
+    else:
+        print(f"Material '{material_name}' not found in Blender environment.")
+
+    return mesh
+
+# Function to place one model as a linked duplicate of its library mesh and make it an active rigid body
+def import_model(spec, import_collection, file_name, size, pass_index, drop_location, category=None):
+    imported_object = bpy.data.objects.new(f"Imported_{file_name}", library_mesh(spec, file_name))
+    import_collection.objects.link(imported_object)
+
+    # Remember what this object is for the frame manifest
+    imported_object["syngen_file"] = file_name
+    imported_object["syngen_size"] = size
+    if category is not None:
+        imported_object["syngen_category"] = category
+
+    # The library mesh has a largest dimension of 1, so the scale is the requested size
+    imported_object.scale = (size, size, size)
+    imported_object.location = drop_location
+
+    physics = spec["physics"]
+    bpy.context.view_layer.objects.active = imported_object
+    bpy.ops.rigidbody.object_add()
+    imported_object.rigid_body.type = 'ACTIVE'
+    imported_object.rigid_body.mass = physics["mass"]
+    imported_object.rigid_body.friction = physics["friction"]
+    imported_object.rigid_body.restitution = physics["restitution"]
+    imported_object.rigid_body.collision_shape = physics["collision_shape"]
+    imported_object.rigid_body.collision_margin = physics["collision_margin"]
+
+    imported_object.pass_index = pass_index
+    return imported_object
+
+# Function to create or retrieve the collection for imported models
+def get_import_collection():
+    collection_name = "Scene Collection"
+    if collection_name in bpy.data.collections:
+        return bpy.data.collections[collection_name]
+
+    import_collection = bpy.data.collections.new(collection_name)
+    bpy.context.scene.collection.children.link(import_collection)
+    return import_collection
+
+# Function to set up the table, the camera rig and the dropped models
+def setup_scene(spec, rng):
+    import_collection = get_import_collection()
+
+    # Delete previous STL models
+    delete_existing_stl_models()
+    gc.collect()
+
+    # Optionally make the table a passive rigid body (older .blend files do not have it set)
+    if spec["table"]["rigid_body"]:
+        table_object = bpy.data.objects.get('Table')
+        if table_object is None:
+            raise ValueError("Object 'Table' not found in the scene.")
+        bpy.context.view_layer.objects.active = table_object
+        if table_object.rigid_body is None:
+            bpy.ops.rigidbody.object_add()
+        table_object.rigid_body.type = 'PASSIVE'
+        table_object.rigid_body.friction = spec["table"]["friction"]
+
+    objects = []
+    for file_name, size, pass_index, category, drop_location in resolve_models(spec, rng):
+        imported_object = import_model(spec, import_collection, file_name, size, pass_index, drop_location, category)
+        objects.append((imported_object, drop_location))
+
+    bpy.context.view_layer.update()
+    print(f"{len(objects)} models imported and configured successfully.")
+    return objects
+
+# Function to replace the previous iteration's scattered objects with a freshly composed clutter layout
+def scatter_objects(spec, fixed_objects, previous, rng):
+    for imported_object, _ in previous:
+        bpy.data.objects.remove(imported_object, do_unlink=True)
+
+    scatter = spec["scatter"]
+    count = scatter["count"]
+    if isinstance(count, list):
+        count = rng.randint(count[0], count[1])
+    models = [{**DEFAULT_MODEL, **model} for model in scatter["models"]]
+
+    # Keep clear of the spec's fixed models too
+    occupied = [(drop_location[0], drop_location[1], bounding_radius(imported_object.scale[0])) for imported_object, drop_location in fixed_objects]
+
+    # Every scattered object gets its own pass_index after the fixed models', so each one is a separate instance
+    # in IndexOB; its category comes from the model entry and is recorded per frame
+    next_index = max([imported_object.pass_index for imported_object, _ in fixed_objects], default=0) + 1
+
+    objects = []
+    height = spec["table"]["height"] + scatter["height"]
+    for model, x, y in compose_scene(rng, models, count, spec["table"], scatter["clearance"], scatter["max_attempts"], occupied):
+        drop_location = (x, y, height)
+        imported_object = import_model(spec, get_import_collection(), model["file"], model["size"], next_index + len(objects),
+                                       drop_location, model_category(spec, model))
+        objects.append((imported_object, drop_location))
+
+    print(f"Scattered {len(objects)} objects on the table.")
+    return objects
+
+# Function to simulate one drop, then freeze the settled transforms as static poses
+def settle_objects(objects, stop_frame, rng):
+    scene = bpy.context.scene
+    rigidbody_world = scene.rigidbody_world
+    if rigidbody_world is None or not objects:
+        return []
+
+    # Re-enable the simulation (it is switched off while the camera sweeps)
+    rigidbody_world.enabled = True
+
+    # Reset the objects' positions and rotations
+    for imported_object, drop_location in objects:
+        reset_object_and_animation(imported_object, drop_location, rng)
+
+    # Bake the drop in one pass from the start frame, instead of stepping and re-evaluating frames
+    rigidbody_world.point_cache.frame_end = stop_frame
+    bpy.ops.ptcache.free_bake_all()
+    bpy.ops.ptcache.bake_all(bake=True)
+    scene.frame_set(stop_frame)
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    poses = [imported_object.evaluated_get(depsgraph).matrix_world.copy() for imported_object, _ in objects]
+
+    # With the simulation off, the objects keep exactly these poses whatever the frame or camera,
+    # so the baked cache is not needed while the camera sweeps
+    rigidbody_world.enabled = False
+    for (imported_object, _), pose in zip(objects, poses):
+        imported_object.matrix_world = pose
+    bpy.ops.ptcache.free_bake_all()
+    bpy.context.view_layer.update()
+    return poses
+
+# Function to list the (iteration, x_index, z_index) frames one shard of the run is responsible for
+def shard_frames(spec, shard=0, shards=1):
+    frames = [(iteration, x_index, z_index)
+              for iteration in range(1, spec["iterations"] + 1)
+              for x_index in range(1, len(spec["camera"]["x_angles"]) + 1)
+              for z_index in range(1, len(spec["camera"]["z_angles"]) + 1)]
+
+    # Contiguous blocks keep each shard's frames within as few drops as possible
+    start = len(frames) * shard // shards
+    end = len(frames) * (shard + 1) // shards
+    return frames[start:end]
+
+# Function to derive a drop's seed from the run seed and the iteration, the same in every process
+def scene_seed(run_seed, iteration):
+    return int(hashlib.sha256(f"{run_seed}:{iteration}".encode()).hexdigest()[:16], 16)
+
+# Function to read this process's current resident set size in MB (None where it cannot be read)
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        pass
+
+    # Windows: the working set of this process
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                       [(field, ctypes.c_size_t) for field in ("PeakWorkingSetSize", "WorkingSetSize",
+                                                               "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                                                               "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                                                               "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize / 2 ** 20
+    return None
+
+# Function to read this process's peak resident set size in MB, for reports only (None where it cannot be read)
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+class MemoryPolicy:
+    # bpy.data collections a run can leave orphaned datablocks in
+    ID_COLLECTIONS = ("objects", "meshes", "materials", "images", "textures", "node_groups", "actions", "collections")
+
+    # Images every render refills; their pixel buffers are dropped on purge and rebuilt by the next render
+    RENDER_IMAGES = ("Render Result", "Viewer Node")
+
+    # Remembers which datablocks existed when the run started, so a purge removes only what the run
+    # created and left unused, instead of walking the whole datablock graph recursively after every render
+    def __init__(self, purge_every=48, rss_limit_mb=None, report_every=48):
+        self.purge_every = purge_every
+        self.rss_limit_mb = rss_limit_mb
+        self.report_every = report_every
+        self.frames = 0
+        self.last_full_purge = 0
+        self.baseline = {name: {datablock.as_pointer() for datablock in getattr(bpy.data, name)} for name in self.ID_COLLECTIONS}
+
+        # A peak value never goes down, so a limit on it would purge on every frame once crossed
+        if rss_limit_mb and rss_mb() is None:
+            print("[memory] The current RSS cannot be read on this platform; rss_limit_mb is ignored")
+            self.rss_limit_mb = None
+
+    # Remove the datablocks created during the run that nothing uses any more, and free the render buffers
+    def purge(self):
+        removed = 0
+        for name in self.ID_COLLECTIONS:
+            collection = getattr(bpy.data, name)
+            baseline = self.baseline[name]
+            orphans = [datablock for datablock in collection
+                       if datablock.users == 0 and not datablock.use_fake_user and datablock.as_pointer() not in baseline]
+            for datablock in orphans:
+                collection.remove(datablock)
+            removed += len(orphans)
+
+        for name in self.RENDER_IMAGES:
+            image = bpy.data.images.get(name)
+            if image is not None:
+                image.buffers_free()
+        gc.collect()
+        return removed
+
+    def after_frame(self):
+        self.frames += 1
+        report = self.report_every and self.frames % self.report_every == 0
+        rss = rss_mb() if report or self.rss_limit_mb else None
+        if report:
+            peak = peak_rss_mb()
+            print(f"[memory] {self.frames} frames rendered, RSS {'unknown' if rss is None else f'{rss:.0f} MB'}"
+                  f" (peak {'unknown' if peak is None else f'{peak:.0f} MB'})")
+
+        if self.purge_every and self.frames % self.purge_every == 0:
+            self.purge()
+
+        # Past the high-water mark, fall back to the full recursive purge the generator used to run every frame,
+        # but at most once per purge_every frames so a run that stays above the mark is not purged on every render
+        over_limit = self.rss_limit_mb and rss is not None and rss > self.rss_limit_mb
+        if over_limit and self.frames - self.last_full_purge >= (self.purge_every or 1):
+            removed = self.purge()
+            bpy.ops.outliner.orphans_purge(do_recursive=True)
+            self.last_full_purge = self.frames
+            print(f"[memory] RSS {rss:.0f} MB over {self.rss_limit_mb} MB: purged {removed} run datablocks and all orphans")
+
+# Function to find the compositor's output nodes once and point them at the frame-numbered templates;
+# Blender then fills in the scene frame, so nothing is rewritten per render
+def configure_outputs(spec):
+    nodes = bpy.context.scene.node_tree.nodes
+    main_output = nodes.get("MainOutput")
+    mask_output = nodes.get("MaskOutput")
+    if main_output is None or mask_output is None:
+        raise ValueError("Compositor nodes 'MainOutput' and 'MaskOutput' not found in the scene.")
+
+    # Both nodes write under output_root, whatever paths the .blend file was saved with
+    main_output.base_path = os.path.join(spec["output_root"], output_name(spec, spec["output"]["main"]))
+    mask_output.base_path = spec["output_root"]
+    mask_output.file_slots[0].path = output_name(spec, spec["output"]["mask"])
+
+    if spec["output"]["mask_pass"] == "index":
+        configure_index_mask(mask_output)
+    elif spec["output"]["mask_pass"] != "id_mask":
+        raise ValueError(f"Unknown mask_pass '{spec['output']['mask_pass']}'; use 'id_mask' or 'index'.")
+
+# Function to get the compositor's Render Layers node with the IndexOB pass switched on
+def index_pass_node():
+    bpy.context.view_layer.use_pass_object_index = True
+    render_layers = next((node for node in bpy.context.scene.node_tree.nodes if node.type == 'R_LAYERS'), None)
+    if render_layers is None:
+        raise ValueError("No Render Layers node found in the compositor.")
+    return render_layers
+
+# Name of the compositor node that scales IndexOB for the 16-bit mask output
+INDEX_MASK_SCALE = "SYNGEN_IndexMaskScale"
+
+# Function to feed the mask output the IndexOB pass, so one render of a mixed scene gives per-object masks
+def configure_index_mask(mask_output):
+    scene = bpy.context.scene
+    nodes = scene.node_tree.nodes
+    render_layers = index_pass_node()
+
+    # A 16-bit PNG stores 0..1 as 0..65535, so dividing by 65535 writes the pass_index values themselves
+    scale = nodes.get(INDEX_MASK_SCALE)
+    if scale is None:
+        scale = nodes.new("CompositorNodeMath")
+        scale.name = INDEX_MASK_SCALE
+    scale.operation = 'DIVIDE'
+    scale.use_clamp = False
+    scale.inputs[1].default_value = 65535
+    scene.node_tree.links.new(render_layers.outputs["IndexOB"], scale.inputs[0])
+    scene.node_tree.links.new(scale.outputs[0], mask_output.inputs[0])
+
+    mask_output.format.file_format = 'PNG'
+    mask_output.format.color_mode = 'BW'
+    mask_output.format.color_depth = '16'
+
+    # Dither noise and the view transform would change the values; the EXR main output is linear either way
+    scene.render.dither_intensity = 0
+    scene.view_settings.view_transform = 'Raw'
+    scene.view_settings.look = 'None'
+
+# Name of the compositor Viewer node the annotations read the IndexOB pass from
+INDEX_VIEWER = "SYNGEN_IndexViewer"
+
+# Function to route the IndexOB pass into a Viewer node once, so every render leaves it readable in memory
+def configure_index_viewer():
+    scene = bpy.context.scene
+    nodes = scene.node_tree.nodes
+    render_layers = index_pass_node()
+
+    viewer = nodes.get(INDEX_VIEWER)
+    if viewer is None:
+        viewer = nodes.new("CompositorNodeViewer")
+        viewer.name = INDEX_VIEWER
+    viewer.use_alpha = False
+    scene.node_tree.links.new(render_layers.outputs["IndexOB"], viewer.inputs["Image"])
+
+    # Only the active Viewer node writes to the "Viewer Node" image
+    nodes.active = viewer
+
+# Function to read the last render's IndexOB values as a (height, width) array, top row first
+def read_index_buffer():
+    image = bpy.data.images.get("Viewer Node")
+    if image is None:
+        raise ValueError("Viewer Node image not found; was the compositor run?")
+    width, height = image.size
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    # Blender stores rows bottom-up; every colour channel holds the index
+    return np.flipud(pixels.reshape(height, width, 4)[:, :, 0])
+
+class AnnotationWriter:
+    # Writes each frame's YOLO labels next to its render and/or COCO entries in format_dataset.py's
+    # JSON-lines form, which merge_jsonl turns into one COCO file for all shards
+    def __init__(self, spec, coco_path):
+        self.spec = spec
+        self.settings = spec["annotations"]
+        self.coco_file = None
+        self.annotation_count = 0
+
+        if "coco" in self.settings["formats"]:
+            new_file = not os.path.exists(coco_path)
+            self.coco_file = open(coco_path, 'a')
+            if new_file:
+                header = {
+                    "info": {"description": f"SYNGEN {spec['name']}", "version": "1.0"},
+                    "licenses": [],
+                    "categories": [{"id": category_id, "name": name, "supercategory": "none"}
+                                   for category_id, name in enumerate(self.settings["categories"])]
+                }
+                self.coco_file.write(json.dumps({"header": header}, separators=(",", ":")) + "\n")
+
+    # categories maps this frame's pass_index values to category ids (see category_table)
+    def write(self, name, number, categories):
+        index_buffer = read_index_buffer()
+        height, width = index_buffer.shape
+        annotations = index_annotations(index_buffer, categories, self.settings["min_area"])
+
+        if "yolo" in self.settings["formats"]:
+            with open(os.path.join(self.spec["output_root"], f"{name}.txt"), 'w') as f:
+                f.write("\n".join(yolo_lines(annotations, width, height)))
+
+        if self.coco_file is not None:
+            # The frame number is unique within the run; merge_jsonl renumbers all ids anyway
+            image = {"id": number, "file_name": name + self.settings["image_extension"], "width": width, "height": height}
+            self.coco_file.write(json.dumps({"image": image}, separators=(",", ":")) + "\n")
+            for annotation in annotations:
+                annotation = {"id": self.annotation_count, "image_id": number, **annotation}
+                self.coco_file.write(json.dumps({"annotation": annotation}, separators=(",", ":")) + "\n")
+                self.annotation_count += 1
+            self.coco_file.flush()
+
+    def close(self):
+        if self.coco_file is not None:
+            self.coco_file.close()
+
+# Function to apply a named render profile to the scene's render settings
+def apply_render_profile(name):
+    profile = RENDER_PROFILES[name]
+    scene = bpy.context.scene
+    scene.render.resolution_percentage = profile["resolution_percentage"]
+
+    if scene.render.engine == 'CYCLES':
+        cycles = scene.cycles
+        cycles.samples = profile["samples"]
+        cycles.use_denoising = profile["denoiser"] is not None
+        if profile["denoiser"] is not None:
+            cycles.denoiser = profile["denoiser"]
+
+        # Blender 3.0+ sets tiles on Cycles, older versions on the render settings
+        if hasattr(cycles, "tile_size"):
+            cycles.tile_size = profile["tile_size"]
+        else:
+            scene.render.tile_x = scene.render.tile_y = profile["tile_size"]
+
+        for setting, value in profile["light_paths"].items():
+            setattr(cycles, setting, value)
+    else:
+        # Eevee has no light paths or tiles; samples are all that carry over
+        scene.eevee.taa_render_samples = profile["samples"]
+
+    print(f"Render profile: {name} ({scene.render.engine})")
+
+# Function to render once and split the time between rendering and the compositor
+# (Blender reports the "Compositing" stage through render_stats; without it, all time counts as render)
+def timed_render():
+    marks = {}
+
+    def on_stats(stats, *args):
+        if "Compositing" in stats and "compositor" not in marks:
+            marks["compositor"] = time.perf_counter()
+
+    bpy.app.handlers.render_stats.append(on_stats)
+    start = time.perf_counter()
+    try:
+        bpy.ops.render.render(write_still=False)
+    finally:
+        bpy.app.handlers.render_stats.remove(on_stats)
+    end = time.perf_counter()
+
+    split = marks.get("compositor", end)
+    return split - start, end - split
+
+# Function to point the camera rig at one (x_index, z_index) pose and render it through the compositor
+def render_frame(spec, empty_object, iteration, x_index, z_index):
+    x_angle = spec["camera"]["x_angles"][x_index - 1]
+    z_angle = spec["camera"]["z_angles"][z_index - 1]
+    print(f"Rendering for X angle: {x_angle}° and Z angle: {z_angle}° in iteration {iteration}")
+
+    start = time.perf_counter()
+    empty_object.rotation_euler[2] = z_angle * (3.14159 / 180)
+    empty_object.rotation_euler[0] = x_angle * (3.14159 / 180)
+
+    # The frame number names the outputs; with the simulation off, changing frames moves nothing but the camera rig
+    bpy.context.scene.frame_set(frame_number(spec, iteration, x_index, z_index))
+    scene_update_time = time.perf_counter() - start
+
+    render_time, compositor_time = timed_render()
+    return scene_update_time, render_time, compositor_time
+
+# Function to describe the settled objects of a drop for the frame manifest
+def object_records(objects):
+    return [{
+        "file": imported_object["syngen_file"],
+        "size": imported_object["syngen_size"],
+        "pass_index": imported_object.pass_index,
+        "category": imported_object.get("syngen_category"),
+        "matrix_world": [list(row) for row in imported_object.matrix_world]
+    } for imported_object, _ in objects]
+
+# Function to map every annotated object's pass_index to its category id for one frame
+def category_table(records):
+    return {record["pass_index"]: record["category"] for record in records if record.get("category") is not None}
+
+# Function to get the Empty the camera rig is parented to
+def get_empty_object():
+    empty_object = bpy.data.objects.get('Empty')
+    if empty_object is None:
+        raise ValueError("Object 'Empty' not found in the scene.")
+    return empty_object
+
+# Function to render the given frames of the scene, simulating each iteration's drop once
+def render_scene(spec, objects, frames, run_seed, manifest_path, timing_path, memory, annotations=None):
+    stop_frame = spec["stop_frame"]
+    empty_object = get_empty_object()
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+
+    scattered = []
+    iterations = sorted({iteration for iteration, _, _ in frames})
+    new_timing_file = not os.path.exists(timing_path)
+    with open(manifest_path, 'a') as manifest, open(timing_path, 'a', newline='') as timing_file:
+        timing = csv.writer(timing_file)
+        if new_timing_file:
+            timing.writerow(["frame", "profile", "scene_update", "physics", "render", "compositor", "annotations", "total"])
+
+        for iteration in iterations:
+            print(f"\n=== Starting iteration {iteration} ===")
+
+            # Everything random about this drop comes from its own seed, so any shard can reproduce it
+            seed = scene_seed(run_seed, iteration)
+            rng = random.Random(seed)
+
+            # A new clutter layout for every drop
+            if spec["scatter"] is not None:
+                scattered = scatter_objects(spec, objects, scattered, rng)
+
+            # Drop the objects once and freeze where they settle
+            start = time.perf_counter()
+            settle_objects(objects + scattered, stop_frame, rng)
+            physics_time = time.perf_counter() - start
+            records = object_records(objects + scattered)
+            categories = category_table(records)
+
+            for _, x_index, z_index in [frame for frame in frames if frame[0] == iteration]:
+                scene_update_time, render_time, compositor_time = render_frame(spec, empty_object, iteration, x_index, z_index)
+
+                start = time.perf_counter()
+                if annotations is not None:
+                    annotations.write(frame_name(spec, iteration, x_index, z_index), frame_number(spec, iteration, x_index, z_index), categories)
+                annotation_time = time.perf_counter() - start
+
+                # The drop's bake is charged to its first frame, so the column sums to the run's physics time
+                frame_times = [scene_update_time, physics_time, render_time, compositor_time, annotation_time]
+                timing.writerow([frame_name(spec, iteration, x_index, z_index), spec["profile"] or "blend"]
+                                + [f"{t:.4f}" for t in frame_times + [sum(frame_times)]])
+                timing_file.flush()
+                physics_time = 0.0
+
+                # One manifest line per frame: enough to re-render it alone later
+                manifest.write(json.dumps({
+                    "frame": frame_name(spec, iteration, x_index, z_index),
+                    "frame_number": frame_number(spec, iteration, x_index, z_index),
+                    "iteration": iteration,
+                    "x_index": x_index,
+                    "z_index": z_index,
+                    "x_angle": spec["camera"]["x_angles"][x_index - 1],
+                    "z_angle": spec["camera"]["z_angles"][z_index - 1],
+                    "run_seed": run_seed,
+                    "seed": seed,
+                    "categories": categories,
+                    "objects": records
+                }) + "\n")
+                manifest.flush()
+
+                memory.after_frame()
+
+    print(f"All {len(frames)} renders completed.")
+
+# Function to read the JSON lines of a file up to the first one a killed run left truncated
+def read_jsonl(path):
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    lines.append((line, json.loads(line)))
+                except ValueError:
+                    break
+    return lines
+
+# Function to pick up a restarted shard where it stopped: the frames in its manifest are kept and skipped,
+# and timing rows or COCO lines of frames that never reached the manifest are dropped so nothing is duplicated.
+# Files left by a run with another seed are removed and the shard starts over.
+def resume_shard(manifest_path, timing_path, coco_path, run_seed):
+    entries = read_jsonl(manifest_path)
+    if any(entry["run_seed"] != run_seed for _, entry in entries):
+        print(f"{manifest_path} was written with another run seed; starting the shard over")
+        entries = []
+
+    if not entries:
+        for path in (manifest_path, timing_path, coco_path):
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+        return set()
+
+    done = {entry["frame"] for _, entry in entries}
+    numbers = {entry["frame_number"] for _, entry in entries}
+    with open(manifest_path, 'w') as f:
+        f.writelines(line for line, _ in entries)
+
+    if os.path.exists(timing_path):
+        with open(timing_path, newline='') as f:
+            rows = list(csv.reader(f))
+        with open(timing_path, 'w', newline='') as f:
+            csv.writer(f).writerows(rows[:1] + [row for row in rows[1:] if row and row[0] in done])
+
+    if coco_path is not None and os.path.exists(coco_path):
+        kept = []
+        for line, item in read_jsonl(coco_path):
+            if "image" in item and item["image"]["id"] not in numbers:
+                continue
+            if "annotation" in item and item["annotation"]["image_id"] not in numbers:
+                continue
+            kept.append(line)
+        with open(coco_path, 'w') as f:
+            f.writelines(kept)
+
+    print(f"Resuming shard: {len(done)} frames already rendered")
+    return done
+
+# Function to re-render frames from a manifest by placing the recorded poses directly (no physics)
+def rerender_frames(spec, manifest_paths, memory, frame_names=None, annotations=None):
+    entries = []
+    for manifest_path in manifest_paths:
+        with open(manifest_path) as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    if frame_names:
+        entries = [entry for entry in entries if entry["frame"] in set(frame_names)]
+
+    # The recorded poses are final, so the simulation stays off
+    if bpy.context.scene.rigidbody_world is not None:
+        bpy.context.scene.rigidbody_world.enabled = False
+
+    empty_object = get_empty_object()
+    import_collection = get_import_collection()
+    delete_existing_stl_models()
+
+    objects = []
+    placed_records = None
+    for entry in entries:
+        # Frames of the same drop share their objects
+        if entry["objects"] != placed_records:
+            for imported_object in objects:
+                bpy.data.objects.remove(imported_object, do_unlink=True)
+            objects = []
+            for record in entry["objects"]:
+                imported_object = bpy.data.objects.new(f"Imported_{record['file']}", library_mesh(spec, record["file"]))
+                import_collection.objects.link(imported_object)
+                imported_object.matrix_world = Matrix(record["matrix_world"])
+                imported_object.pass_index = record["pass_index"]
+                objects.append(imported_object)
+            placed_records = entry["objects"]
+
+        render_frame(spec, empty_object, entry["iteration"], entry["x_index"], entry["z_index"])
+        if annotations is not None:
+            annotations.write(entry["frame"], entry["frame_number"], category_table(entry["objects"]))
+        memory.after_frame()
+
+    print(f"Re-rendered {len(entries)} frames.")
+
+def main():
+    args = parse_args()
+    spec = load_spec(args.scene)
+    if args.output_root is not None:
+        spec["output_root"] = args.output_root
+    # A relative output_root is taken from the working directory, not from the .blend file's folder
+    spec["output_root"] = os.path.abspath(spec["output_root"])
+    if args.iterations is not None:
+        spec["iterations"] = args.iterations
+
+    if args.profile is not None:
+        spec["profile"] = args.profile
+    if spec["profile"] is not None:
+        apply_render_profile(spec["profile"])
+
+    memory = MemoryPolicy(**spec["memory"])
+
+    configure_outputs(spec)
+
+    # Re-rendered frames get their own COCO lines; list the rerender file after the shard files in merge_jsonl,
+    # which keeps the last image of each file_name, so they replace the originals (and a later re-render the earlier)
+    os.makedirs(spec["output_root"], exist_ok=True)
+    coco_part = "rerender" if args.rerender else f"{args.shard:03d}"
+    coco_path = os.path.join(spec["output_root"], f"{spec['name']}_coco_{coco_part}.jsonl") if "coco" in spec["annotations"]["formats"] else None
+
+    if not args.rerender:
+        # Without an explicit seed, pick one and record it so every frame can still be reproduced
+        run_seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+        print(f"Run seed: {run_seed}")
+
+        # A restarted shard (same seed) only renders the frames its manifest does not have yet
+        manifest_path = os.path.join(spec["output_root"], f"{spec['name']}_frames_{args.shard:03d}.jsonl")
+        timing_path = os.path.join(spec["output_root"], f"{spec['name']}_timing_{args.shard:03d}.csv")
+        done = resume_shard(manifest_path, timing_path, coco_path, run_seed)
+        frames = [frame for frame in shard_frames(spec, args.shard, args.shards) if frame_name(spec, *frame) not in done]
+
+    annotations = None
+    if spec["annotations"]["formats"]:
+        configure_index_viewer()
+        annotations = AnnotationWriter(spec, coco_path)
+
+    try:
+        if args.rerender:
+            rerender_frames(spec, args.rerender, memory, args.frames, annotations)
+            return
+
+        objects = setup_scene(spec, random.Random(scene_seed(run_seed, 0)))
+        render_scene(spec, objects, frames, run_seed, manifest_path, timing_path, memory, annotations)
+    finally:
+        if annotations is not None:
+            annotations.close()
+
+if __name__ == "__main__":
+    main()
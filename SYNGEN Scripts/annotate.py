@@ -0,0 +1,66 @@
+import numpy as np
+
+# Annotations straight from the compositor's IndexOB buffer for SYNGEN.py (no bpy, so it can be tried outside Blender)
+
+# Polygons need OpenCV, which Blender's Python usually lacks; without it only boxes are written
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Function to turn a (height, width) buffer of pass_index values (top row first) into one annotation per pass_index,
+# in the same form as format_dataset.mask_annotations: bbox [x, y, w, h], pixel area and polygon segmentation
+def index_annotations(index_buffer, class_map, min_area=0):
+    height, width = index_buffer.shape
+    indices = np.rint(index_buffer).astype(np.int64)
+    counts = np.bincount(indices.ravel())
+
+    annotations = []
+    for pass_index in np.flatnonzero(counts):
+        if pass_index == 0 or counts[pass_index] < min_area:
+            continue
+
+        category_id = class_map.get(int(pass_index))
+        if category_id is None:
+            continue
+
+        binary_mask = indices == pass_index
+        rows = np.flatnonzero(binary_mask.any(axis=1))
+        cols = np.flatnonzero(binary_mask.any(axis=0))
+        x, y = int(cols[0]), int(rows[0])
+        w, h = int(cols[-1]) - x + 1, int(rows[-1]) - y + 1
+
+        # An occluded object can be split into several polygons of the same instance; slivers with no polygon
+        # of 3 points are skipped as format_dataset.mask_annotations does, so a YOLO file never mixes box and polygon lines
+        segmentation = []
+        if cv2 is not None:
+            contours, _ = cv2.findContours(binary_mask.astype(np.uint8) * 255, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            segmentation = [contour.flatten().tolist() for contour in contours if len(contour) >= 3]
+            if not segmentation:
+                continue
+
+        annotations.append({
+            "pass_index": int(pass_index),
+            "category_id": category_id,
+            "bbox": [x, y, w, h],
+            "area": int(counts[pass_index]),
+            # Share of the image the object covers, as mask_percentage.py reports it
+            "visible_percent": round(float(counts[pass_index]) / (width * height) * 100, 4),
+            "segmentation": segmentation,
+            "iscrowd": 0
+        })
+    return annotations
+
+# Function to write the YOLO label lines of one frame: one polygon line per contour, or box lines when OpenCV is missing
+def yolo_lines(annotations, width, height):
+    lines = []
+    for annotation in annotations:
+        class_id = annotation["category_id"]
+        if annotation["segmentation"]:
+            for polygon in annotation["segmentation"]:
+                normalized_points = (np.array(polygon, dtype=np.float64).reshape(-1, 2) / np.array([width, height])).ravel()
+                lines.append(f"{class_id} " + " ".join(["%.6f"] * normalized_points.size) % tuple(normalized_points.tolist()))
+        else:
+            x, y, w, h = annotation["bbox"]
+            lines.append("%d %.6f %.6f %.6f %.6f" % (class_id, (x + w / 2) / width, (y + h / 2) / height, w / width, h / height))
+    return lines
@@ -0,0 +1,65 @@
+import math
+
+# Plain-Python scene composition for SYNGEN.py (no bpy, so it can be tried outside Blender)
+
+# Function to get the bounding-sphere radius of a library model scaled to `size`
+# (its normalized bounding box fits in a cube of side `size`, whatever the rotation)
+def bounding_radius(size):
+    return size * math.sqrt(3) / 2
+
+class SpatialHash:
+    # Uniform grid over the table; a cell is at least as wide as any possible overlap distance,
+    # so a new circle only has to be checked against the 3x3 cells around it
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def insert(self, x, y, radius):
+        self.cells.setdefault(self._cell(x, y), []).append((x, y, radius))
+
+    def overlaps(self, x, y, radius, clearance=0.0):
+        cell_x, cell_y = self._cell(x, y)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other_x, other_y, other_radius in self.cells.get((cell_x + dx, cell_y + dy), []):
+                    min_distance = radius + other_radius + clearance
+                    if (x - other_x) ** 2 + (y - other_y) ** 2 < min_distance ** 2:
+                        return True
+        return False
+
+# Function to place up to `count` models from `models` on the table without overlapping drop positions
+# (`occupied` lists (x, y, radius) of objects already placed by other means)
+def compose_scene(rng, models, count, table, clearance=0.01, max_attempts=100, occupied=()):
+    center_x, center_y = table.get("center", (0, 0))
+    half_length, half_width = table["length"] / 2, table["width"] / 2
+
+    largest_radius = max([bounding_radius(model["size"]) for model in models] + [radius for _, _, radius in occupied])
+    grid = SpatialHash(2 * largest_radius + clearance)
+    for x, y, radius in occupied:
+        grid.insert(x, y, radius)
+
+    placements = []
+    for _ in range(count):
+        model = rng.choice(models)
+        radius = bounding_radius(model["size"])
+
+        # The whole bounding sphere has to start above the table
+        if radius > half_length or radius > half_width:
+            print(f"Model {model['file']} is too large for the table. Skipping.")
+            continue
+
+        # Try random spots; a model with no free spot is left out rather than simulated into an explosion
+        for _ in range(max_attempts):
+            x = center_x + rng.uniform(-half_length + radius, half_length - radius)
+            y = center_y + rng.uniform(-half_width + radius, half_width - radius)
+            if not grid.overlaps(x, y, radius, clearance):
+                grid.insert(x, y, radius)
+                placements.append((model, x, y))
+                break
+
+    if len(placements) < count:
+        print(f"Placed {len(placements)} of {count} objects; the rest found no free position in {max_attempts} attempts.")
+    return placements
@@ -0,0 +1,27 @@
+import re
+
+# Frame numbering and output names for SYNGEN.py (no bpy, so dataset scripts can map names back to poses)
+
+# Function to number a frame across the whole run: iterations first, then X angles, then Z angles, starting at 1
+def frame_number(spec, iteration, x_index, z_index):
+    x_count = len(spec["camera"]["x_angles"])
+    z_count = len(spec["camera"]["z_angles"])
+    return ((iteration - 1) * x_count + (x_index - 1)) * z_count + z_index
+
+# Function to get (iteration, x_index, z_index) back from a frame number
+def frame_indices(spec, number):
+    z_count = len(spec["camera"]["z_angles"])
+    pose, z_index = divmod(number - 1, z_count)
+    iteration, x_index = divmod(pose, len(spec["camera"]["x_angles"]))
+    return iteration + 1, x_index + 1, z_index + 1
+
+# Function to fill an output template with the scene name and, if given, the frame number
+def output_name(spec, template, number=None):
+    name = template.format(name=spec["name"])
+    if number is None:
+        return name
+    return re.sub(r"#+", lambda digits: f"{number:0{len(digits.group())}d}", name)
+
+# Function to get the output name of one frame (the main output's file name without extension)
+def frame_name(spec, iteration, x_index, z_index):
+    return output_name(spec, spec["output"]["main"], frame_number(spec, iteration, x_index, z_index))
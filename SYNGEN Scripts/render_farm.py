@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+
+# Runs outside Blender: launches N headless Blender workers, each rendering one shard of the
+# (iteration, x_index, z_index) frame space of a SYNGEN scene, and restarts any that crash.
+#   python render_farm.py --blend "../Blender Project/Syn Data Generator.blend" --scene scenes/tshape.json --workers 8
+# On several machines, give each one the same --machines count and --seed, and its own --machine-index.
+
+GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SYNGEN.py")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render a SYNGEN scene with several Blender processes")
+    parser.add_argument("--blender", default="blender", help="Blender executable")
+    parser.add_argument("--blend", required=True, help="The .blend file holding the table, camera rig and compositor")
+    parser.add_argument("--scene", required=True, help="Scene spec passed to SYNGEN.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Blender processes on this machine")
+    parser.add_argument("--threads", type=int, help="Render threads per worker (default: cores / workers)")
+    parser.add_argument("--machines", type=int, default=1, help="Machines sharing the run")
+    parser.add_argument("--machine-index", type=int, default=0, help="Index of this machine in the run")
+    parser.add_argument("--seed", type=int, help="Run seed shared by every shard (drops are seeded per iteration; random by default)")
+    parser.add_argument("--max-restarts", type=int, default=3, help="Restarts allowed per crashed worker")
+    parser.add_argument("--log-dir", default="farm_logs", help="Folder for per-shard Blender logs")
+    parser.add_argument("extra", nargs=argparse.REMAINDER, help="Extra SYNGEN.py arguments after '--'")
+    return parser.parse_args()
+
+# Function to build the Blender command line for one shard
+def shard_command(args, shard, shards, threads):
+    extra = args.extra[1:] if args.extra[:1] == ["--"] else args.extra
+    return [
+        args.blender, "-b", args.blend,
+        "-t", str(threads),
+        # Without this Blender exits with 0 even when the script raised
+        "--python-exit-code", "1",
+        "-P", GENERATOR, "--",
+        "--scene", args.scene,
+        "--shard", str(shard),
+        "--shards", str(shards),
+        "--seed", str(args.seed)
+    ] + extra
+
+# Function to start one worker with its output going to a per-shard log file
+def launch(args, shard, shards, threads):
+    log_path = os.path.join(args.log_dir, f"shard_{shard:03d}.log")
+    log_file = open(log_path, 'a')
+    process = subprocess.Popen(shard_command(args, shard, shards, threads), stdout=log_file, stderr=subprocess.STDOUT)
+    print(f"Started shard {shard}/{shards} (pid {process.pid}), logging to {log_path}")
+    return process, log_file
+
+def main():
+    args = parse_args()
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    # One seed for every shard and every restart, so a restarted shard resumes instead of starting over;
+    # print it, since other machines of the same run need it too
+    if args.seed is None:
+        args.seed = random.randrange(2 ** 32)
+    print(f"Run seed: {args.seed}")
+
+    # Shards of the whole run that belong to this machine
+    shards = args.workers * args.machines
+    local_shards = range(args.machine_index * args.workers, (args.machine_index + 1) * args.workers)
+    threads = args.threads or max(1, os.cpu_count() // args.workers)
+
+    running = {shard: launch(args, shard, shards, threads) for shard in local_shards}
+    restarts = {shard: 0 for shard in local_shards}
+    failed = []
+    start = time.time()
+
+    while running:
+        time.sleep(1)
+        for shard, (process, log_file) in list(running.items()):
+            returncode = process.poll()
+            if returncode is None:
+                continue
+
+            log_file.close()
+            del running[shard]
+            if returncode == 0:
+                print(f"Shard {shard} finished after {time.time() - start:.0f}s")
+            elif restarts[shard] < args.max_restarts:
+                restarts[shard] += 1
+                print(f"Shard {shard} exited with code {returncode}, restart {restarts[shard]}/{args.max_restarts}")
+                running[shard] = launch(args, shard, shards, threads)
+            else:
+                print(f"Shard {shard} failed {args.max_restarts + 1} times, giving up")
+                failed.append(shard)
+
+    print(f"Farm finished in {time.time() - start:.0f}s, {len(local_shards) - len(failed)}/{len(local_shards)} shards succeeded")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
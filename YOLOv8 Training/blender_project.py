@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Importing this module makes the dataset helpers shared by the training folders importable
+# (index masks, manifests, shards, batched inference I/O); they live next to the Blender post-processing scripts
+HELPERS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Blender Project"))
+if HELPERS_DIR not in sys.path:
+    sys.path.append(HELPERS_DIR)
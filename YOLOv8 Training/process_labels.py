@@ -2,9 +2,40 @@ import os
 import cv2
 import numpy as np
 
-def generate_yolo_labels(rgb_dir, mask_dir, label_dir, class_map):
+import blender_project  # puts the shared helpers on sys.path
+from manifest import load_manifest, save_manifest, is_current, record, manifest_outputs, prune_manifest
+from index_mask import read_index_mask, decode_index_mask
+
+def polygon_to_yolo(contour, width, height, class_id, simplify_epsilon=0.0):
+    # Optionally simplify the polygon (Douglas-Peucker, epsilon in pixels)
+    if simplify_epsilon > 0:
+        contour = cv2.approxPolyDP(contour, simplify_epsilon, True)
+
+    # Ensure the polygon has at least 3 points
+    if len(contour) < 3:
+        return None
+
+    # Normalize the whole (N, 1, 2) contour at once into x0 y0 x1 y1 ... order
+    normalized_points = (contour.reshape(-1, 2) / np.array([width, height], dtype=np.float64)).ravel()
+
+    # Format every coordinate with one bulk %-format instead of one f-string per float
+    points_str = " ".join(["%.6f"] * normalized_points.size) % tuple(normalized_points.tolist())
+    return f"{class_id} {points_str}"
+
+def generate_yolo_labels(rgb_dir, mask_dir, label_dir, class_map, incremental=True, simplify_epsilon=0.0, index_map=None, index_scale=1):
     os.makedirs(label_dir, exist_ok=True)
 
+    # JSON-safe form of the pass_index map for the manifest parameters
+    index_params = None if index_map is None else [[k, v] for k, v in sorted(index_map.items())]
+    # Only a non-default scale goes into the parameters, so existing manifests stay valid
+    if index_map is not None and index_scale != 1:
+        index_params.append(["scale", index_scale])
+
+    # Load the record of which labels earlier runs already wrote
+    manifest = load_manifest(label_dir) if incremental else {}
+    previous_outputs = manifest_outputs(manifest)
+    live_files = []
+
     rgb_files = sorted([f for f in os.listdir(rgb_dir) if f.endswith('.png') or f.endswith('.jpg')])
     mask_files = sorted([f for f in os.listdir(mask_dir) if f.endswith('.png') or f.endswith('.jpg')])
 
@@ -12,52 +43,64 @@ def generate_yolo_labels(rgb_dir, mask_dir, label_dir, class_map):
         rgb_path = os.path.join(rgb_dir, rgb_file)
         mask_path = os.path.join(mask_dir, mask_file)
 
-        # Determine class from the file name
+        # Determine class from the file name (index masks carry their own classes)
         class_name = rgb_file.split('_')[0]  # Assumes format "class_name_*"
         class_id = class_map.get(class_name, -1)
 
-        if class_id == -1:
+        if index_map is None and class_id == -1:
             print(f"Unknown class name '{class_name}' in file '{rgb_file}'. Skipping.")
             continue
+        params = [class_id, simplify_epsilon, index_params]
+
+        # Skip pairs whose label file is already up to date
+        label_file = os.path.join(label_dir, os.path.splitext(rgb_file)[0] + ".txt")
+        live_files.append(rgb_file)
+        if incremental and is_current(manifest, rgb_file, [mask_path], [label_file], params):
+            continue
 
         # Load mask image
-        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        if index_map is None:
+            mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        else:
+            mask = read_index_mask(mask_path)
         if mask is None:
             print(f"Could not read mask: {mask_path}")
             continue
 
-        # Threshold to ensure binary mask
-        _, binary_mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
-
-        # Find contours in the binary mask
-        contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if index_map is None:
+            # Threshold to ensure binary mask
+            _, binary_mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+            instances = [(class_id, binary_mask)]
+        else:
+            # One binary mask per pass_index value, each with its mapped class
+            instances = [(category_id, binary_mask) for _, category_id, binary_mask in decode_index_mask(mask, index_map, index_scale)]
 
         # Get image dimensions
         height, width = mask.shape
 
         # Prepare label file content
         label_content = []
-        for contour in contours:
-            # Normalize contour points
-            normalized_points = []
-            for point in contour:
-                x, y = point[0]  # Extract x, y from the point array
-                normalized_x = x / width
-                normalized_y = y / height
-                normalized_points.extend([normalized_x, normalized_y])
-
-            # Convert normalized points to YOLO polygon format
-            if len(normalized_points) >= 6:  # Ensure the polygon has at least 3 points
-                points_str = " ".join(f"{p:.6f}" for p in normalized_points)
-                label_content.append(f"{class_id} {points_str}")
+        for instance_class, binary_mask in instances:
+            # Find contours in the binary mask
+            contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+            for contour in contours:
+                line = polygon_to_yolo(contour, width, height, instance_class, simplify_epsilon)
+                if line:
+                    label_content.append(line)
 
         # Save label file
-        label_file = os.path.join(label_dir, os.path.splitext(rgb_file)[0] + ".txt")
         with open(label_file, 'w') as file:
             file.write("\n".join(label_content))
+        if incremental:
+            record(manifest, rgb_file, [mask_path], [label_file], params)
 
         print(f"Label file created: {label_file}")
 
+    if incremental:
+        prune_manifest(manifest, live_files, previous_outputs)
+        save_manifest(label_dir, manifest)
+
 if __name__ == "__main__":
     # Directories
     rgb_directory = "/home/rmoraga/CAD Project/Prismatic Geometries/quantity_dataset/val/images"
@@ -72,5 +115,9 @@ if __name__ == "__main__":
         "null": 3
     }
 
+    # For mixed-scene renders with pass_index masks, map each pass_index to a class id instead
+    index_mapping = None  # e.g. {1: 1, 9: 0}, for masks rendered with SYNGEN's "output": {"mask_pass": "index"}
+    # (the .blend file's own ID Mask output is binary); pass index_scale=... for masks scaled some other way
+
     # Generate labels
-    generate_yolo_labels(rgb_directory, mask_directory, label_directory, class_mapping)
+    generate_yolo_labels(rgb_directory, mask_directory, label_directory, class_mapping, index_map=index_mapping)
@@ -1,34 +1,66 @@
 import os
 import cv2
+import json
+import numpy as np
 from ultralytics import YOLO
 from pathlib import Path
+import blender_project  # puts the shared helpers on sys.path
+from batch_io import prefetch_batches, BoundedWriter
 
-def perform_inference(input_folder, output_folder, model_path, conf_threshold=0.25):
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff')
+
+def save_result(result, output_path, save_format):
+    if save_format == "image":
+        # Get the annotated image
+        cv2.imwrite(output_path, result.plot())
+        return
+
+    # Raw predictions, no overlay rendering
+    boxes = result.boxes
+    prediction = {
+        "boxes": boxes.xyxy.cpu().numpy(),
+        "scores": boxes.conf.cpu().numpy(),
+        "classes": boxes.cls.cpu().numpy().astype(np.int32)
+    }
+    if save_format == "npz":
+        if result.masks is not None:
+            prediction["masks"] = result.masks.data.cpu().numpy().astype(np.uint8)
+        np.savez_compressed(output_path, **prediction)
+    else:
+        prediction = {key: value.tolist() for key, value in prediction.items()}
+        if result.masks is not None:
+            prediction["polygons"] = [polygon.tolist() for polygon in result.masks.xy]
+        with open(output_path, 'w') as f:
+            json.dump(prediction, f, separators=(",", ":"))
+
+def perform_inference(input_folder, output_folder, model_path, conf_threshold=0.25, batch_size=1, writers=4, save_format="image"):
     # Create output folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
 
     # Load the YOLO model
     model = YOLO(model_path)
 
-    # Process each image in the input folder
-    for image_file in os.listdir(input_folder):
-        input_path = os.path.join(input_folder, image_file)
-        
-        # Ensure it's an image file
-        if not image_file.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff')):
+    # Ensure it's an image file
+    image_files = []
+    for image_file in sorted(os.listdir(input_folder)):
+        if not image_file.lower().endswith(IMAGE_EXTENSIONS):
             print(f"Skipping non-image file: {image_file}")
             continue
+        image_files.append(image_file)
 
-        # Perform inference
-        results = model(input_path, conf=conf_threshold)
-        
-        # Get the annotated image
-        annotated_frame = results[0].plot()
+    # Writes run on a thread pool so the next batch is not held up by disk I/O
+    with BoundedWriter(writers, writers * batch_size * 2) as writer:
+        for names, images in prefetch_batches(input_folder, image_files, batch_size):
+            # Perform inference on the whole batch in one call
+            results = model(images, conf=conf_threshold, verbose=False)
 
-        # Save the annotated image to the output folder
-        output_path = os.path.join(output_folder, image_file)
-        cv2.imwrite(output_path, annotated_frame)
-        print(f"Processed and saved: {output_path}")
+            for image_file, result in zip(names, results):
+                if save_format == "image":
+                    output_path = os.path.join(output_folder, image_file)
+                else:
+                    output_path = os.path.join(output_folder, f"{Path(image_file).stem}.{save_format}")
+                writer.submit(save_result, result, output_path, save_format)
+                print(f"Processed {image_file} -> {output_path}")
 
     print("Inference completed.")
 
@@ -39,5 +71,5 @@ if __name__ == "__main__":
     output_folder = "/home/rmoraga/YOLO Training/runs/segment/quantity/test"  # Folder to save output images
     model_path = "/home/rmoraga/YOLO Training/runs/segment/quantity/weights/best.pt"  # Path to your YOLOv8 model
 
-    # Perform inference
-    perform_inference(input_folder, output_folder, model_path)
+    # Perform inference (save_format="json" or "npz" dumps raw predictions without rendering overlays)
+    perform_inference(input_folder, output_folder, model_path, batch_size=8)